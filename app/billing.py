@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from psycopg.types.json import Json
+
+from app import db
+
+# Plan changes are appended to the payment_event ledger. app_user.plan and
+# pro_until are a projection of the latest event per user, recomputed for all
+# affected users in one set-based statement; expired pro plans are swept by a
+# periodic job over ix_app_user_pro_until instead of being evaluated per request.
+
+logger = logging.getLogger("app.billing")
+
+BILLING_JOB_INTERVAL = float(os.getenv("BILLING_JOB_INTERVAL", "60") or 60)
+PRO_PAYMENT_DAYS = 365
+
+
+def record_telegram_payment(cur, tg_user_id: int, payment: dict) -> None:
+    # telegram_payment_charge_id makes the event idempotent across replays
+    cur.execute(
+        """
+        INSERT INTO payment_event (user_id, kind, plan, pro_until, source_ref, payload)
+        SELECT id, 'telegram_payment', 'pro', now() + make_interval(days => %s), %s, %s
+        FROM app_user
+        WHERE tg_user_id = %s
+        ON CONFLICT (source_ref) WHERE source_ref IS NOT NULL DO NOTHING
+        """,
+        (PRO_PAYMENT_DAYS, payment.get("telegram_payment_charge_id"), Json(payment), tg_user_id),
+    )
+
+
+def record_admin_plan(cur, user_id: int, plan: str, days: Optional[int]) -> bool:
+    """Append an admin plan change; returns False when the user does not exist."""
+    days_int = int(days) if plan == "pro" and days else None
+    cur.execute(
+        """
+        INSERT INTO payment_event (user_id, kind, plan, pro_until)
+        SELECT id, 'admin_set', %s,
+               CASE WHEN %s::int IS NULL THEN NULL ELSE now() + make_interval(days => %s::int) END
+        FROM app_user
+        WHERE id = %s
+        """,
+        (plan, days_int, days_int, user_id),
+    )
+    return cur.rowcount == 1
+
+
+def recompute_plans(cur) -> int:
+    """Project the latest ledger event onto app_user for every user with unapplied events."""
+    cur.execute(
+        """
+        WITH pending AS (
+            UPDATE payment_event
+            SET applied_at = now()
+            WHERE applied_at IS NULL
+            RETURNING user_id
+        ),
+        latest AS (
+            SELECT DISTINCT ON (e.user_id) e.user_id, e.plan, e.pro_until
+            FROM payment_event e
+            WHERE e.user_id IN (SELECT user_id FROM pending)
+            ORDER BY e.user_id, e.id DESC
+        )
+        UPDATE app_user u
+        SET plan = CASE WHEN latest.plan = 'pro' AND latest.pro_until <= now() THEN 'free' ELSE latest.plan END,
+            pro_until = latest.pro_until
+        FROM latest
+        WHERE u.id = latest.user_id
+        """
+    )
+    return cur.rowcount
+
+
+def sweep_expired(cur) -> int:
+    cur.execute(
+        """
+        UPDATE app_user
+        SET plan = 'free'
+        WHERE plan = 'pro' AND pro_until IS NOT NULL AND pro_until <= now()
+        """
+    )
+    return cur.rowcount
+
+
+def run_billing_jobs() -> dict:
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            recomputed = recompute_plans(cur)
+            expired = sweep_expired(cur)
+    if recomputed or expired:
+        logger.info("billing jobs: %d plan(s) recomputed, %d expired", recomputed, expired)
+    return {"recomputed": recomputed, "expired": expired}
+
+
+class BillingJobs:
+    def __init__(self, interval: float = BILLING_JOB_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="billing-jobs")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(run_billing_jobs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("billing jobs failed")
+            await asyncio.sleep(self.interval)
+
+
+jobs = BillingJobs()
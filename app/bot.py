@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import signal
+from typing import Awaitable, Callable, List, Optional
+
+from app import db, inbox
+from app.challenges import LEVELS, DailyChallengeCache, today
+from app.content import exercise_bank, exercise_index
+from app.telegram import BotAPIClient, TelegramError, get_bot_client
+
+# Telegram bot worker: python -m app.bot [--source poll|inbox]
+#
+# Updates come either from getUpdates long-polling or by tailing the webhook
+# inbox (telegram_update_inbox). They are dispatched to a fixed number of
+# shards by chat id: each shard handles its chats strictly in order, while
+# the shard count bounds concurrency and the bounded shard queues apply
+# backpressure to the update source.
+
+logger = logging.getLogger("app.bot")
+
+BOT_SHARDS = int(os.getenv("BOT_SHARDS", "64") or 64)
+BOT_QUEUE_SIZE = int(os.getenv("BOT_QUEUE_SIZE", "1000") or 1000)
+BOT_POLL_TIMEOUT = int(os.getenv("BOT_POLL_TIMEOUT", "30") or 30)
+# DB work runs in asyncio.to_thread: a few pooled connections cover it
+BOT_DB_POOL_SIZE = int(os.getenv("BOT_DB_POOL_SIZE", "4") or 4)
+ALLOWED_UPDATES = ["message", "callback_query", "pre_checkout_query"]
+
+
+def chat_id_of(update: dict) -> Optional[int]:
+    for key in ("message", "edited_message", "channel_post"):
+        if key in update:
+            return (update[key].get("chat") or {}).get("id")
+    if "callback_query" in update:
+        message = update["callback_query"].get("message") or {}
+        return (message.get("chat") or {}).get("id") or (update["callback_query"].get("from") or {}).get("id")
+    if "pre_checkout_query" in update:
+        return (update["pre_checkout_query"].get("from") or {}).get("id")
+    return None
+
+
+class Dispatcher:
+    """Shard updates by chat: per-chat ordering with bounded concurrency."""
+
+    def __init__(self, handler: Callable[[dict], Awaitable[None]], shards: int = BOT_SHARDS, queue_size: int = BOT_QUEUE_SIZE):
+        self.handler = handler
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(shards)]
+        self._tasks: List[asyncio.Task] = []
+        self.handled = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(q), name=f"bot-shard-{i}") for i, q in enumerate(self.queues)]
+
+    async def submit(self, update: dict) -> None:
+        chat_id = chat_id_of(update)
+        key = chat_id if chat_id is not None else update.get("update_id", 0)
+        await self.queues[hash(key) % len(self.queues)].put(update)
+
+    async def join(self) -> None:
+        await asyncio.gather(*(q.join() for q in self.queues))
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.handler(update)
+                self.handled += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Failed to handle update %s", update.get("update_id"))
+            finally:
+                queue.task_done()
+
+
+# the stored daily_challenge sets, kept as documents rather than bytes:
+# /daily asks exactly what GET /challenges/daily serves
+daily_challenges = DailyChallengeCache(lambda doc: doc)
+
+
+def challenge_drill(item: dict) -> dict:
+    """A daily challenge item in drill form (id, text, options, correct)."""
+    if item.get("kind") == "drill":
+        return {"id": item["drill_id"], "text": item["text"], "options": item["options"], "correct": item["correct"]}
+    return task_drill(item["task_id"], item.get("prompt") or {}, item.get("answer_schema") or {})
+
+
+def task_drill(task_id: int, prompt: dict, answer: dict) -> dict:
+    options, correct = list(prompt.get("options") or []), answer.get("index")
+    if not options and "is_correct" in answer:
+        options, correct = ["True", "False"], 0 if answer["is_correct"] else 1
+    return {"id": f"task-{task_id}", "text": prompt.get("text") or "", "options": options, "correct": correct}
+
+
+def find_drill(drill_id: str) -> Optional[dict]:
+    if not drill_id.startswith("task-"):
+        return exercise_index().get(drill_id)
+    try:
+        task_id = int(drill_id[len("task-"):])
+    except ValueError:
+        return None
+    with db.connect() as conn, conn.cursor() as cur:
+        cur.execute("SELECT content, answer FROM task WHERE id = %s", (task_id,))
+        row = cur.fetchone()
+    return task_drill(task_id, row[0] or {}, row[1] or {}) if row else None
+
+
+def daily_drills(level: int = 1) -> List[dict]:
+    return [challenge_drill(item) for item in daily_challenges.get(today(), level)["items"]]
+
+
+class Bot:
+    def __init__(self, client: BotAPIClient):
+        self.client = client
+
+    async def handle(self, update: dict) -> None:
+        if "pre_checkout_query" in update:
+            # Telegram aborts the payment unless this is answered within 10 seconds
+            await self.client.call("answerPreCheckoutQuery", {"pre_checkout_query_id": update["pre_checkout_query"]["id"], "ok": True})
+            return
+        if "callback_query" in update:
+            await self._on_callback(update["callback_query"])
+            return
+        message = update.get("message") or {}
+        if message.get("successful_payment"):
+            # Billing is applied by the inbox pipeline; make sure it sees the update
+            if await asyncio.to_thread(inbox.enqueue_update, update):
+                await asyncio.to_thread(inbox.drain)
+            await self.send(message["chat"]["id"], "Payment received, thank you! Pro is now active.")
+            return
+        text = (message.get("text") or "").strip()
+        if not text.startswith("/"):
+            return
+        command, _, arg = text.partition(" ")
+        command = command.split("@", 1)[0].lower()
+        chat_id = message["chat"]["id"]
+        if command in ("/start", "/help"):
+            await self.send(chat_id, "Hi! /daily [level] - today's challenge, /drill [topic] - a practice question.")
+        elif command == "/daily":
+            level = int(arg) if arg.strip().isdigit() and int(arg) in LEVELS else 1
+            for drill in await asyncio.to_thread(daily_drills, level):
+                await self.ask(chat_id, drill)
+        elif command == "/drill":
+            await self.ask(chat_id, self.pick_drill(arg.strip()))
+
+    def pick_drill(self, topic: str = "") -> Optional[dict]:
+        bank = exercise_bank()
+        if topic:
+            bank = tuple(d for d in bank if topic.lower() in d["topic"].lower()) or bank
+        return random.choice(bank) if bank else None
+
+    async def ask(self, chat_id: int, drill: Optional[dict]) -> None:
+        if drill is None:
+            await self.send(chat_id, "No exercises available yet.")
+            return
+        if not drill["options"]:
+            await self.send(chat_id, drill["text"])  # free-text task: nothing to tap
+            return
+        keyboard = [[{"text": opt, "callback_data": f"ans:{drill['id']}:{i}"}] for i, opt in enumerate(drill["options"])]
+        await self.send(chat_id, drill["text"], reply_markup={"inline_keyboard": keyboard})
+
+    async def _on_callback(self, query: dict) -> None:
+        await self.client.call("answerCallbackQuery", {"callback_query_id": query["id"]})
+        parts = (query.get("data") or "").split(":")
+        chat_id = chat_id_of({"callback_query": query})
+        if len(parts) != 3 or parts[0] != "ans" or chat_id is None:
+            return
+        drill = await asyncio.to_thread(find_drill, parts[1])
+        if drill is None:
+            return
+        if parts[2] == str(drill["correct"]):
+            await self.send(chat_id, "✅ Correct!")
+        else:
+            await self.send(chat_id, f"❌ Correct answer: {drill['options'][drill['correct']]}")
+
+    async def send(self, chat_id: int, text: str, **extra) -> None:
+        await self.client.call("sendMessage", {"chat_id": chat_id, "text": text, **extra})
+
+
+async def poll_updates(client: BotAPIClient, dispatcher: Dispatcher, stop: asyncio.Event, timeout: int = BOT_POLL_TIMEOUT) -> None:
+    offset: Optional[int] = None
+    stopped = asyncio.create_task(stop.wait())
+    while not stop.is_set():
+        params = {"timeout": timeout, "allowed_updates": ALLOWED_UPDATES}
+        if offset is not None:
+            params["offset"] = offset
+        poll = asyncio.create_task(client.call("getUpdates", params, timeout=timeout + 10))
+        # do not hold shutdown hostage to an idle long poll
+        await asyncio.wait({poll, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if not poll.done():
+            poll.cancel()
+            await asyncio.gather(poll, return_exceptions=True)
+            break
+        try:
+            updates = poll.result()
+        except TelegramError:
+            logger.exception("getUpdates failed")
+            await asyncio.sleep(1)
+            continue
+        for update in updates or []:
+            await dispatcher.submit(update)
+            offset = update["update_id"] + 1
+    stopped.cancel()
+
+
+def _fetch_inbox_after(update_id: Optional[int], limit: int) -> list:
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            if update_id is None:
+                # start from the current tail: old updates were already answered
+                cur.execute("SELECT COALESCE(MAX(update_id), 0) FROM telegram_update_inbox")
+                return [(cur.fetchone()[0], None)]
+            cur.execute(
+                "SELECT update_id, payload FROM telegram_update_inbox WHERE update_id > %s ORDER BY update_id LIMIT %s",
+                (update_id, limit),
+            )
+            return cur.fetchall()
+
+
+async def tail_inbox(dispatcher: Dispatcher, stop: asyncio.Event, interval: float = 0.5, batch: int = 500) -> None:
+    last_id: Optional[int] = None
+    while not stop.is_set():
+        try:
+            rows = await asyncio.to_thread(_fetch_inbox_after, last_id, batch)
+        except Exception:
+            logger.exception("Reading the inbox failed")
+            rows = []
+        for update_id, payload in rows:
+            last_id = update_id
+            if payload is not None and not (payload.get("message") or {}).get("successful_payment"):
+                await dispatcher.submit(payload)
+        if len(rows) < batch:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run(source: str = "poll", shards: int = BOT_SHARDS, stop: Optional[asyncio.Event] = None) -> None:
+    token = os.getenv("BOT_TOKEN", "")
+    if not token:
+        raise SystemExit("BOT_TOKEN is not set")
+    stop = stop or asyncio.Event()
+    # inbox tailing, drill lookups and challenge misses borrow from this pool
+    # instead of handshaking a new connection each time
+    own_pool = db.pool is None
+    db.open_pool(1, BOT_DB_POOL_SIZE)
+    client = get_bot_client(token)
+    bot = Bot(client)
+    dispatcher = Dispatcher(bot.handle, shards=shards)
+    dispatcher.start()
+    exercise_bank()  # warm the content cache before the first update
+    try:
+        if source == "inbox":
+            await tail_inbox(dispatcher, stop)
+        else:
+            await poll_updates(client, dispatcher, stop)
+    finally:
+        await dispatcher.join()
+        await dispatcher.stop()
+        await client.aclose()
+        if own_pool:
+            await asyncio.to_thread(db.close_pool)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.bot", description="EngTrain Telegram bot worker")
+    parser.add_argument("--source", choices=("poll", "inbox"), default=os.getenv("BOT_SOURCE", "poll"),
+                        help="getUpdates long-polling, or tail the webhook inbox")
+    parser.add_argument("--shards", type=int, default=BOT_SHARDS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run(args.source, args.shards, stop)
+
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from psycopg.types.json import Json
+
+from app.content import exercise_bank
+from app import db
+
+# Daily challenges: one set per (UTC day, level), generated once from the DB
+# task bank and the bundled drills, weighted towards the topics the whole
+# population is weakest at (topic_stats). The set is stored in
+# daily_challenge and kept in process memory as serialized bytes, so serving
+# it is a dict lookup.
+
+logger = logging.getLogger("app.challenges")
+
+LEVELS = (1, 2, 3)
+DAILY_CHALLENGE_SIZE = int(os.getenv("DAILY_CHALLENGE_SIZE", "10") or 10)
+DAILY_JOB_INTERVAL = float(os.getenv("DAILY_JOB_INTERVAL", "3600") or 3600)
+# How strongly population weakness skews selection (0 = uniform)
+WEAKNESS_BOOST = float(os.getenv("DAILY_WEAKNESS_BOOST", "4") or 0)
+# Topics need this many attempts overall before their accuracy counts
+MIN_TOPIC_ATTEMPTS = 20
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def pick_weighted(items: Sequence, weights: Sequence[float], n: int, rng: random.Random) -> list:
+    """Weighted sample without replacement (Efraimidis-Spirakis keys)."""
+    keyed = []
+    for item, w in zip(items, weights):
+        if w > 0:
+            keyed.append((math.log(1.0 - rng.random()) / w, item))
+    keyed.sort(key=lambda k: k[0], reverse=True)
+    return [item for _, item in keyed[:n]]
+
+
+def _topic_weakness(cur) -> Dict[str, float]:
+    cur.execute(
+        """
+        SELECT topic, SUM(attempts) AS attempts, SUM(correct) AS correct
+        FROM topic_stats
+        GROUP BY topic
+        HAVING SUM(attempts) >= %s
+        """,
+        (MIN_TOPIC_ATTEMPTS,),
+    )
+    return {topic: 1.0 - float(correct) / float(attempts) for topic, attempts, correct in cur.fetchall()}
+
+
+def _lesson_level(raw: Optional[str]) -> int:
+    try:
+        return int(raw) if raw else 1
+    except ValueError:
+        return 1
+
+
+def _task_candidates(cur, level: int) -> List[dict]:
+    cur.execute(
+        """
+        SELECT t.id, t.lesson_id, COALESCE(l.topic, t.topic, '') AS topic, t.content, t.answer,
+               COALESCE(l.metadata->>'level', l.metadata->>'difficulty') AS level
+        FROM task t
+        JOIN lesson l ON l.id = t.lesson_id
+        """
+    )
+    return [
+        {"kind": "task", "task_id": r[0], "lesson_id": r[1], "topic": r[2], "prompt": r[3] or {}, "answer_schema": r[4] or {}}
+        for r in cur.fetchall()
+        if _lesson_level(r[5]) == level
+    ]
+
+
+def _drill_candidates(level: int) -> List[dict]:
+    return [
+        {"kind": "drill", "drill_id": d["id"], "topic": d["topic"], "text": d["text"], "options": d["options"], "correct": d["correct"]}
+        for d in exercise_bank()
+        if d["level"] == level
+    ]
+
+
+def build_challenge(cur, day: date, level: int, size: int = DAILY_CHALLENGE_SIZE) -> dict:
+    weakness = _topic_weakness(cur)
+    candidates = _task_candidates(cur, level) + _drill_candidates(level)
+    weights = [1.0 + WEAKNESS_BOOST * weakness.get(c["topic"], 0.0) for c in candidates]
+    rng = random.Random(f"{day.isoformat()}:{level}")
+    items = pick_weighted(candidates, weights, size, rng)
+    return {"day": day.isoformat(), "level": level, "items": items}
+
+
+def ensure_challenge(conn, day: date, level: int) -> dict:
+    """Return the stored set for (day, level), generating it if missing."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT payload FROM daily_challenge WHERE day=%s AND level=%s", (day, level))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        payload = build_challenge(cur, day, level)
+        cur.execute(
+            """
+            INSERT INTO daily_challenge (day, level, payload)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (day, level) DO NOTHING
+            RETURNING payload
+            """,
+            (day, level, Json(payload)),
+        )
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        # another worker won the race: serve what it stored
+        cur.execute("SELECT payload FROM daily_challenge WHERE day=%s AND level=%s", (day, level))
+        return cur.fetchone()[0]
+
+
+class DailyChallengeCache:
+    """Serialized challenge documents per (day, level), filled once per process."""
+
+    def __init__(self, dumps):
+        self._dumps = dumps
+        self._docs: Dict[Tuple[date, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, day: date, level: int) -> bytes:
+        key = (day, level)
+        doc = self._docs.get(key)
+        if doc is not None:
+            return doc
+        # single flight: a 9am burst costs one DB read, not one per request
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is None:
+                with db.connect() as conn:
+                    doc = self._dumps(ensure_challenge(conn, day, level))
+                self._docs = {k: v for k, v in self._docs.items() if k[0] >= day - timedelta(days=1)}
+                self._docs[key] = doc
+        return doc
+
+    def is_warm(self, day: date) -> bool:
+        return all((day, level) in self._docs for level in LEVELS)
+
+    def precompute(self, days: Sequence[date]) -> None:
+        for day in days:
+            for level in LEVELS:
+                self.get(day, level)
+
+
+class DailyChallengeJob:
+    def __init__(self, cache: DailyChallengeCache, interval: float = DAILY_JOB_INTERVAL):
+        self.cache = cache
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="daily-challenges")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            day = today()
+            try:
+                # tomorrow's sets are ready before the first request after midnight
+                await asyncio.to_thread(self.cache.precompute, [day, day + timedelta(days=1)])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("daily challenge precompute failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Immutable exercise content shipped with the repo (exercises_data/ drills and
+# static/seed lessons), normalized once per process into multiple-choice drills:
+#   {"id", "topic", "level", "text", "options", "correct"}
+
+logger = logging.getLogger("app.content")
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+EXERCISES_DIR = os.path.join(BASE_DIR, "exercises_data")
+SEED_DIR = os.path.join(BASE_DIR, "static", "seed")
+
+
+def _normalize_task(task: dict, topic: str, level: int, drill_id: str) -> Optional[dict]:
+    content = task.get("content") or task
+    answer = task.get("answer") or {}
+    text = content.get("text") or content.get("question")
+    if not text:
+        return None
+    options = content.get("options")
+    if options:
+        correct = answer.get("index")
+        if not isinstance(correct, int) or not 0 <= correct < len(options):
+            return None
+        options = [str(o) for o in options]
+    elif isinstance(answer.get("is_correct"), bool):
+        options = ["True", "False"]
+        correct = 0 if answer["is_correct"] else 1
+    else:
+        return None
+    return {"id": drill_id, "topic": topic, "level": level, "text": text, "options": options, "correct": correct}
+
+
+def _iter_items(data) -> List[dict]:
+    if isinstance(data, dict):
+        data = data.get("items") or []
+    return [it for it in data if isinstance(it, dict)] if isinstance(data, list) else []
+
+
+def _load_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        logger.warning("Skipping unreadable content file %s", path)
+        return None
+
+
+def _content_files() -> List[Tuple[str, str]]:
+    files = []
+    for root_dir, prefix in ((EXERCISES_DIR, "ex"), (SEED_DIR, "seed")):
+        if not os.path.isdir(root_dir):
+            continue
+        for dirpath, _, names in sorted(os.walk(root_dir)):
+            for name in sorted(names):
+                if name.endswith(".json"):
+                    path = os.path.join(dirpath, name)
+                    rel = os.path.splitext(os.path.relpath(path, root_dir))[0].replace(os.sep, "/")
+                    files.append((f"{prefix}:{rel}", path))
+    return files
+
+
+@lru_cache(maxsize=1)
+def exercise_bank() -> Tuple[dict, ...]:
+    drills: List[dict] = []
+    for source, path in _content_files():
+        for i, item in enumerate(_iter_items(_load_json(path))):
+            topic = item.get("topic_code") or item.get("topic") or ""
+            level = int(item.get("difficulty") or item.get("level") or 1)
+            tasks = item.get("tasks") if isinstance(item.get("tasks"), list) else [item]
+            for j, task in enumerate(tasks):
+                # short stable id: fits Telegram's 64-byte callback_data
+                drill_id = hashlib.sha1(f"{source}:{i}:{j}".encode()).hexdigest()[:12]
+                drill = _normalize_task(task, topic, level, drill_id)
+                if drill:
+                    drills.append(drill)
+    return tuple(drills)
+
+
+@lru_cache(maxsize=1)
+def exercise_index() -> Dict[str, dict]:
+    return {d["id"]: d for d in exercise_bank()}
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+
+from psycopg.rows import dict_row
+
+from app import db
+
+# Read-only snapshot of lesson details in one memory-mapped file, so workers
+# share a single copy through the page cache and GET /lesson/{id} is served
+# from slices of the mapping instead of the database.
+#
+# Layout (little-endian):
+#   header  magic b"ECS1" | u32 count | u64 built_at_ns
+#   index   count x (i64 lesson_id | u64 doc_offset | u32 doc_len | u64 theory_offset | u32 theory_len),
+#           sorted by lesson_id
+#   blobs   UTF-8: the serialized /lesson/{id} response, then the theory text
+#
+# app.serve builds and maps it in the master before forking; single-process
+# servers build it during warm-up. A rebuild writes a new file and renames it
+# over the old one; readers notice the new inode within
+# CONTENT_STORE_CHECK_INTERVAL seconds and remap.
+#
+# In front of it, each worker keeps an LRU of serialized lesson documents
+# (full and compact, with their ETags) keyed by lesson id and the store's
+# build time, so a rebuild invalidates every entry at once. Lessons that had
+# to be read from the database are only kept for LESSON_CACHE_TTL seconds.
+
+logger = logging.getLogger("app.content_store")
+
+CONTENT_STORE_PATH = os.getenv("CONTENT_STORE_PATH") or os.path.join(tempfile.gettempdir(), "english-ai-content.bin")
+CONTENT_STORE_CHECK_INTERVAL = float(os.getenv("CONTENT_STORE_CHECK_INTERVAL", "5") or 0)
+
+MAGIC = b"ECS1"
+_HEADER = struct.Struct("<4sIQ")
+_ENTRY = struct.Struct("<qQIQI")
+
+LESSON_CACHE_SIZE = int(os.getenv("LESSON_CACHE_SIZE", "2048") or 0)
+LESSON_CACHE_TTL = float(os.getenv("LESSON_CACHE_TTL", "60") or 0)
+
+
+def lesson_doc(row: dict) -> dict:
+    metadata = row.get("metadata") or {}
+    theory = metadata.get("theory") if isinstance(metadata, dict) else None
+    return {
+        "lesson_id": row["id"],
+        "title": row["title"],
+        "topic": row.get("topic"),
+        "theory": theory,
+        "metadata": metadata,
+    }
+
+
+def compact_doc(doc: dict) -> dict:
+    """The lesson without the copy of its theory inside metadata."""
+    metadata = doc.get("metadata")
+    if isinstance(metadata, dict) and "theory" in metadata:
+        doc = dict(doc, metadata={k: v for k, v in metadata.items() if k != "theory"})
+    return doc
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def write_store(path: str, records: Iterable[Tuple[int, bytes, bytes]]) -> int:
+    """Write (lesson_id, doc, theory) records; the file appears atomically."""
+    records = sorted(records, key=lambda r: r[0])
+    offset = _HEADER.size + _ENTRY.size * len(records)
+    index = bytearray()
+    for lesson_id, doc, theory in records:
+        index += _ENTRY.pack(lesson_id, offset, len(doc), offset + len(doc), len(theory))
+        offset += len(doc) + len(theory)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".content-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(records), time.time_ns()))
+            f.write(index)
+            for _, doc, theory in records:
+                f.write(doc)
+                f.write(theory)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(records)
+
+
+class ContentStore:
+    def __init__(self, path: str = CONTENT_STORE_PATH, check_interval: float = CONTENT_STORE_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._view: Optional[memoryview] = None
+        self._count = 0
+        self.version = 0  # built_at_ns of the mapped file
+        self._identity: Optional[Tuple[int, int]] = None  # (st_ino, st_mtime_ns) of the mapped file
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._view is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def open(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_size < _HEADER.size:
+                    return False
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return False
+        view = memoryview(mapped)
+        magic, count, built_at = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a content store")
+        # the previous mapping is released once no response still holds a slice of it
+        self._view, self._count, self.version = view, count, built_at
+        self._identity = (st.st_ino, st.st_mtime_ns)
+        self._next_check = time.monotonic() + self.check_interval
+        return True
+
+    def close(self) -> None:
+        self._view, self._count, self._identity, self.version = None, 0, None, 0
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if (st.st_ino, st.st_mtime_ns) != self._identity:
+                self.open()
+
+    def current_version(self) -> int:
+        """Build time of the mapped file after any pending remap; 0 without a store."""
+        if self._view is None:
+            return 0
+        self._maybe_reload()
+        return self.version
+
+    def _find(self, lesson_id: int) -> Optional[tuple]:
+        if self._view is None:
+            return None
+        self._maybe_reload()
+        view, lo, hi = self._view, 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = _ENTRY.unpack_from(view, _HEADER.size + mid * _ENTRY.size)
+            if entry[0] < lesson_id:
+                lo = mid + 1
+            elif entry[0] > lesson_id:
+                hi = mid
+            else:
+                return view, entry
+        return None
+
+    def doc(self, lesson_id: int) -> Optional[memoryview]:
+        """Serialized /lesson/{id} body as a slice of the mapping, or None."""
+        found = self._find(lesson_id)
+        if found is None:
+            return None
+        view, (_, offset, length, _, _) = found
+        return view[offset:offset + length]
+
+    def theory(self, lesson_id: int) -> Optional[memoryview]:
+        found = self._find(lesson_id)
+        if found is None:
+            return None
+        view, (_, _, _, offset, length) = found
+        return view[offset:offset + length]
+
+    def build(self, dumps: Callable[[object], bytes]) -> int:
+        """Snapshot every lesson from the database into the file and map it."""
+        with db.connect() as conn, db.query_name("content_store_build"):
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute("SELECT id, title, topic, metadata FROM lesson")
+                records = []
+                for row in cur:
+                    doc = lesson_doc(row)
+                    theory = doc["theory"] if isinstance(doc["theory"], str) else ""
+                    records.append((row["id"], dumps(doc), theory.encode("utf-8")))
+        count = write_store(self.path, records)
+        self.open()
+        logger.info("content store %s: %d lessons", self.path, count)
+        return count
+
+
+class LessonEntry:
+    __slots__ = ("full", "compact", "full_etag", "compact_etag", "expires_at")
+
+    def __init__(self, full: bytes, compact: bytes, expires_at: float = float("inf")):
+        self.full = full
+        self.compact = compact
+        self.full_etag = etag(full)
+        self.compact_etag = self.full_etag if compact is full else etag(compact)
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_doc(cls, doc: dict, dumps: Callable[[object], bytes], full: Optional[bytes] = None,
+                 expires_at: float = float("inf")) -> "LessonEntry":
+        full = dumps(doc) if full is None else full
+        compact = compact_doc(doc)
+        return cls(full, full if compact is doc else dumps(compact), expires_at)
+
+    def body(self, compact: bool = False) -> bytes:
+        return self.compact if compact else self.full
+
+    def etag(self, compact: bool = False) -> str:
+        return self.compact_etag if compact else self.full_etag
+
+
+class LessonCache:
+    def __init__(self, maxsize: int = LESSON_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Tuple[int, int], LessonEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, lesson_id: int, version: int, now: float) -> Optional[LessonEntry]:
+        key = (lesson_id, version)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def put(self, lesson_id: int, version: int, entry: LessonEntry) -> LessonEntry:
+        if self.maxsize <= 0:
+            return entry
+        with self._lock:
+            self._items[(lesson_id, version)] = entry
+            self._items.move_to_end((lesson_id, version))
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def lookup(self, store: ContentStore, lesson_id: int, version: int, now: float,
+               dumps: Callable[[object], bytes]) -> Optional[LessonEntry]:
+        """Cached entry, else one built from the mapped store; None means ask the database."""
+        entry = self.get(lesson_id, version, now)
+        if entry is None:
+            raw = store.doc(lesson_id)
+            if raw is not None:
+                full = bytes(raw)
+                entry = self.put(lesson_id, version, LessonEntry.from_doc(json.loads(full), dumps, full))
+        return entry
+
+
+store = ContentStore()
+lesson_cache = LessonCache()
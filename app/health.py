@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+import psycopg
+
+from app import db
+
+# Readiness checks behind GET /health/ready. Liveness (/health/live) touches
+# nothing: a process that answers is alive. Readiness is what the platform
+# routes traffic on, so it checks what requests need: a pooled connection,
+# a DB round trip within budget, a schema at the migration head this code was
+# written for, and warm caches. The report is computed at most once per
+# HEALTH_CACHE_TTL seconds however many probes arrive.
+
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "1") or 0)
+HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", "2") or 2)
+HEALTH_DB_MAX_LATENCY_MS = float(os.getenv("HEALTH_DB_MAX_LATENCY_MS", "500") or 500)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+Check = Callable[[], dict]
+
+
+@lru_cache(maxsize=1)
+def expected_heads() -> Tuple[str, ...]:
+    from alembic.script import ScriptDirectory
+
+    return tuple(sorted(ScriptDirectory(MIGRATIONS_DIR).get_heads()))
+
+
+def check_pool() -> dict:
+    stats = db.pool_stats()
+    if stats is None:
+        return {"ok": True, "mode": "direct"}
+    # exhausted: every connection is out and the pool cannot grow
+    ok = stats["available"] > 0 or stats["size"] < stats["max"]
+    return {"ok": ok, **stats}
+
+
+def _database_round_trip() -> Tuple[float, Tuple[str, ...]]:
+    def query(conn) -> Tuple[float, Tuple[str, ...]]:
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute("SELECT version_num FROM alembic_version")
+            versions = tuple(sorted(r[0] for r in cur.fetchall()))
+        return (time.perf_counter() - started) * 1000, versions
+
+    if db.pool is not None:
+        with db.pool.connection(timeout=HEALTH_DB_TIMEOUT) as conn:
+            return query(conn)
+    with psycopg.connect(db.DB_URL, autocommit=True, connect_timeout=max(1, int(HEALTH_DB_TIMEOUT))) as conn:
+        return query(conn)
+
+
+def check_database() -> Dict[str, dict]:
+    """DB latency and migration head from one round trip."""
+    expected = list(expected_heads())
+    try:
+        latency_ms, versions = _database_round_trip()
+    except Exception as exc:
+        error = {"ok": False, "error": type(exc).__name__}
+        return {"database": error, "migrations": {**error, "expected": expected}}
+    return {
+        "database": {
+            "ok": latency_ms <= HEALTH_DB_MAX_LATENCY_MS,
+            "latencyMs": round(latency_ms, 2),
+            "budgetMs": HEALTH_DB_MAX_LATENCY_MS,
+        },
+        "migrations": {"ok": list(versions) == expected, "current": list(versions), "expected": expected},
+    }
+
+
+class Readiness:
+    def __init__(self, ttl: float = HEALTH_CACHE_TTL):
+        self.ttl = ttl
+        # name -> check returning {"ok": bool, ...}; a group check returns {name: {...}}
+        self.checks: Dict[str, Check] = {}
+        self.groups: Dict[str, Callable[[], Dict[str, dict]]] = {}
+        self._report: Optional[dict] = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, check: Check) -> None:
+        self.checks[name] = check
+
+    def add_group(self, name: str, check: Callable[[], Dict[str, dict]]) -> None:
+        self.groups[name] = check
+
+    def _run(self) -> dict:
+        results: Dict[str, dict] = {}
+        for name, check in self.checks.items():
+            try:
+                results[name] = check()
+            except Exception as exc:
+                results[name] = {"ok": False, "error": type(exc).__name__}
+        for name, group in self.groups.items():
+            try:
+                results.update(group())
+            except Exception as exc:
+                results[name] = {"ok": False, "error": type(exc).__name__}
+        return {"ready": all(r.get("ok") for r in results.values()), "checks": results}
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        if self._report is not None and now < self._expires:
+            return self._report
+        # single flight: concurrent probes wait for one evaluation
+        with self._lock:
+            if self._report is None or time.monotonic() >= self._expires:
+                self._report = self._run()
+                self._expires = time.monotonic() + self.ttl
+            return self._report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._report = None
+            self._expires = 0.0
+
+
+readiness = Readiness()
+readiness.add("pool", check_pool)
+readiness.add_group("database", check_database)
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from psycopg.types.json import Json
+
+from app import billing, db
+
+# Telegram webhook inbox: /telegram/webhook only persists the update (keyed
+# by update_id, so Telegram retries are deduplicated) and acknowledges; a
+# pool of background workers drains pending rows in batches with
+# FOR UPDATE SKIP LOCKED, so several workers/processes can share the queue.
+# All of it runs on pooled connections (db.connect). A failed update is
+# retried after INBOX_RETRY_BACKOFF * 2^(attempts - 1) seconds, capped at
+# INBOX_RETRY_BACKOFF_MAX, instead of on the very next drain.
+
+logger = logging.getLogger("app.inbox")
+
+INBOX_WORKERS = int(os.getenv("INBOX_WORKERS", "2") or 0)
+INBOX_BATCH_SIZE = int(os.getenv("INBOX_BATCH_SIZE", "100") or 100)
+INBOX_POLL_INTERVAL = float(os.getenv("INBOX_POLL_INTERVAL", "5") or 5)
+INBOX_MAX_ATTEMPTS = int(os.getenv("INBOX_MAX_ATTEMPTS", "5") or 5)
+INBOX_RETRY_BACKOFF = float(os.getenv("INBOX_RETRY_BACKOFF", "5") or 0)
+INBOX_RETRY_BACKOFF_MAX = float(os.getenv("INBOX_RETRY_BACKOFF_MAX", "600") or 0)
+
+
+class InboxMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.processing_seconds = 0.0
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = max(time.monotonic() - self.started_at, 1e-9)
+            return {
+                "received": self.received,
+                "duplicates": self.duplicates,
+                "processed": self.processed,
+                "failed": self.failed,
+                "batches": self.batches,
+                "processing_seconds": round(self.processing_seconds, 6),
+                "processed_per_second": round(self.processed / uptime, 3),
+                "avg_batch_ms": round(1000 * self.processing_seconds / self.batches, 3) if self.batches else 0.0,
+            }
+
+
+metrics = InboxMetrics()
+
+
+def enqueue_update(update: dict) -> bool:
+    """Persist a raw update; returns False when update_id was already seen."""
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO telegram_update_inbox (update_id, payload)
+                VALUES (%s, %s)
+                ON CONFLICT (update_id) DO NOTHING
+                """,
+                (int(update["update_id"]), Json(update)),
+            )
+            inserted = cur.rowcount == 1
+    metrics.add(received=1, duplicates=0 if inserted else 1)
+    return inserted
+
+
+def apply_update(cur, update: dict) -> None:
+    # Detect successful payment in update
+    message = update.get("message") or {}
+    sp = message.get("successful_payment")
+    if not sp:
+        return
+    from_user = message.get("from") or {}
+    tg_id = from_user.get("id")
+    if tg_id:
+        billing.record_telegram_payment(cur, tg_id, sp)
+
+
+def process_batch(conn, batch_size: int = INBOX_BATCH_SIZE) -> int:
+    """Process one batch of pending updates in a single transaction; returns rows handled."""
+    started = time.perf_counter()
+    done: List[int] = []
+    failed = 0
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT update_id, payload
+                FROM telegram_update_inbox
+                WHERE processed_at IS NULL AND attempts < %s
+                  AND (next_attempt_at IS NULL OR next_attempt_at <= now())
+                ORDER BY update_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (INBOX_MAX_ATTEMPTS, batch_size),
+            )
+            rows = cur.fetchall()
+            for update_id, payload in rows:
+                try:
+                    # Savepoint: one bad update must not roll back the batch
+                    with conn.transaction():
+                        apply_update(cur, payload)
+                    done.append(update_id)
+                except Exception as e:
+                    failed += 1
+                    logger.exception("Inbox update %s failed", update_id)
+                    cur.execute(
+                        """
+                        UPDATE telegram_update_inbox
+                        SET attempts = attempts + 1, last_error = %s,
+                            next_attempt_at = now() + make_interval(secs => LEAST(%s * power(2, attempts), %s))
+                        WHERE update_id = %s
+                        """,
+                        (str(e)[:1000], INBOX_RETRY_BACKOFF, INBOX_RETRY_BACKOFF_MAX, update_id),
+                    )
+            if done:
+                cur.execute(
+                    """
+                    UPDATE telegram_update_inbox
+                    SET processed_at = now(), attempts = attempts + 1, last_error = NULL, next_attempt_at = NULL
+                    WHERE update_id = ANY(%s)
+                    """,
+                    (done,),
+                )
+                # Project this batch's ledger events onto app_user in one statement
+                billing.recompute_plans(cur)
+    if rows:
+        metrics.add(processed=len(done), failed=failed, batches=1, processing_seconds=time.perf_counter() - started)
+    return len(rows)
+
+
+def drain(max_batches: Optional[int] = None, batch_size: int = INBOX_BATCH_SIZE) -> int:
+    """Process pending updates until the inbox is empty; returns rows handled."""
+    total = 0
+    batches = 0
+    with db.connect() as conn:
+        while max_batches is None or batches < max_batches:
+            n = process_batch(conn, batch_size)
+            total += n
+            batches += 1
+            if n < batch_size:
+                break
+    return total
+
+
+def pending_count() -> int:
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM telegram_update_inbox WHERE processed_at IS NULL")
+            return cur.fetchone()[0]
+
+
+class InboxWorkerPool:
+    def __init__(self, workers: int = INBOX_WORKERS, poll_interval: float = INBOX_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(i), name=f"inbox-worker-{i}") for i in range(self.workers)]
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, index: int) -> None:
+        while True:
+            try:
+                handled = await asyncio.to_thread(drain)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Inbox worker %d failed to drain", index)
+                handled = 0
+            if handled:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+worker_pool = InboxWorkerPool()
+
+
+# ---- Replay tool: python -m app.inbox ----
+
+def replay(update_ids: Optional[List[int]] = None, since: Optional[str] = None, failed_only: bool = False) -> int:
+    """Mark updates pending again so workers re-apply them; returns rows reset."""
+    conds = []
+    params: list = []
+    if update_ids:
+        conds.append("update_id = ANY(%s)")
+        params.append(update_ids)
+    if since:
+        conds.append("received_at >= %s::timestamptz")
+        params.append(since)
+    if failed_only:
+        conds.append("processed_at IS NULL AND attempts >= %s")
+        params.append(INBOX_MAX_ATTEMPTS)
+    if not conds:
+        raise ValueError("refusing to replay the whole inbox without a filter")
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE telegram_update_inbox SET processed_at = NULL, attempts = 0, last_error = NULL,"
+                " next_attempt_at = NULL WHERE "
+                + " AND ".join(conds),
+                params,
+            )
+            return cur.rowcount
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.inbox", description="Telegram webhook inbox tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_replay = sub.add_parser("replay", help="reset updates to pending")
+    p_replay.add_argument("--update-id", type=int, action="append", dest="update_ids")
+    p_replay.add_argument("--since", help="ISO timestamp, matches received_at")
+    p_replay.add_argument("--failed", action="store_true", help="only updates that exhausted their attempts")
+    p_replay.add_argument("--process", action="store_true", help="drain the inbox right after resetting")
+    sub.add_parser("process", help="drain pending updates once")
+    sub.add_parser("stats", help="print pending count")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cmd == "replay":
+        print(f"reset {replay(args.update_ids, args.since, args.failed)} update(s)")
+        if args.process:
+            print(f"processed {drain()} update(s)")
+    elif args.cmd == "process":
+        started = time.perf_counter()
+        n = drain()
+        elapsed = time.perf_counter() - started
+        print(f"processed {n} update(s) in {elapsed:.3f}s ({n / elapsed if elapsed else 0:.1f}/s)")
+    elif args.cmd == "stats":
+        print(f"pending {pending_count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import db
+
+# Minimal Prometheus text-format (0.0.4) metrics: counters, gauges and
+# histograms with labels, plus an ASGI middleware recording per-route HTTP
+# latency, in-flight requests, DB vs Python time, rows returned and response
+# bytes. Exposed at /metrics.
+#
+# With APP_DEBUG=1 every response also carries its own DB counters as
+# X-DB-Statements / X-DB-Round-Trips / X-DB-Connections / X-DB-Time-Ms.
+#
+# Under app.serve every worker has its own registry. With METRICS_DIR set
+# (app.serve sets it), each worker writes a snapshot of its registry there
+# every METRICS_SNAPSHOT_INTERVAL seconds and when it stops, and /metrics,
+# whichever worker answers, renders the sum of all snapshots. Counters and
+# histograms of exited workers keep counting, so totals never go backwards;
+# gauges only come from live workers.
+
+logger = logging.getLogger("app.metrics")
+
+APP_DEBUG = os.getenv("APP_DEBUG", "0") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROWS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICS_DIR: Optional[str] = os.getenv("METRICS_DIR") or None
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5") or 5)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    def _merge(self, current, value, live: bool):
+        return value if current is None else current + value
+
+    def merged(self, snapshots: Iterable[Tuple[list, bool]]) -> dict:
+        """Combine (snapshot, from a live process) pairs into one value map."""
+        values: dict = {}
+        for items, live in snapshots:
+            for key, value in items:
+                key = tuple(key)
+                merged = self._merge(values.get(key), value, live)
+                if merged is not None:
+                    values[key] = merged
+        return values
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        with self._lock:
+            items = sorted((self._values if values is None else values).items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.label_names, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, *args, merge: str = "sum", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.merge = merge  # across workers: "sum", "max" or "min"
+
+    def _merge(self, current, value, live: bool):
+        if not live:
+            return current
+        if current is None:
+            return value
+        if self.merge == "max":
+            return max(current, value)
+        if self.merge == "min":
+            return min(current, value)
+        return current + value
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[idx] += 1
+            data[-1] += value
+
+    def count(self, *labels: str) -> int:
+        data = self._values.get(self._key(labels))
+        return int(sum(data[:-1])) if data else 0
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._values.items()]
+
+    def _merge(self, current, value, live: bool):
+        if current is None or len(current) != len(value):
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in (self._values if values is None else values).items())
+        lines = self.header()
+        for key, data in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), data[:-1]):
+                cumulative += n
+                le = _fmt_value(bound) if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.label_names, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.label_names, key)} {repr(float(data[-1]))}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render_merged(self, snapshots: List[Tuple[dict, bool]]) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            values = metric.merged((snap.get(metric.name, []), live) for snap, live in snapshots)
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests_total = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_requests_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Wall time per request.", ("method", "route")))
+http_request_db_time = REGISTRY.register(Histogram(
+    "http_request_db_seconds", "Time spent in database calls per request.", ("method", "route")))
+http_request_python_time = REGISTRY.register(Histogram(
+    "http_request_python_seconds", "Request wall time minus database time.", ("method", "route")))
+http_request_db_rows = REGISTRY.register(Histogram(
+    "http_request_db_rows", "Rows returned by the database per request.", ("method", "route"), ROWS_BUCKETS))
+http_request_db_statements = REGISTRY.register(Histogram(
+    "http_request_db_statements", "Statements executed per request.", ("method", "route"), COUNT_BUCKETS))
+http_response_bytes = REGISTRY.register(Histogram(
+    "http_response_bytes", "Response body size.", ("method", "route"), BYTES_BUCKETS))
+db_query_duration = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Duration of named queries.", ("query",)))
+app_warmup_seconds = REGISTRY.register(Gauge(
+    "app_warmup_seconds", "Duration of each startup warm-up step.", ("step",), merge="max"))
+app_warmup_done = REGISTRY.register(Gauge(
+    "app_warmup_done", "1 once a startup warm-up step has completed successfully.", ("step",), merge="min"))
+app_startup_seconds = REGISTRY.register(Gauge(
+    "app_startup_seconds", "Time from lifespan start until the app accepts requests.", merge="max"))
+lesson_cache_lookups = REGISTRY.register(Counter(
+    "lesson_cache_lookups_total", "Lesson documents served from the worker cache or store (hit) or the DB (miss).",
+    ("result",)))
+
+
+# ---- Worker snapshots ----
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_snapshot(directory: Optional[str] = None, registry: Optional[Registry] = None) -> None:
+    directory = directory or METRICS_DIR
+    registry = registry or REGISTRY
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, os.path.join(directory, f"{os.getpid()}.json"))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_snapshots(directory: Optional[str] = None) -> List[Tuple[dict, bool]]:
+    snapshots = []
+    for path in glob.glob(os.path.join(directory or METRICS_DIR, "*.json")):
+        try:
+            pid = int(os.path.basename(path)[:-len(".json")])
+            with open(path, encoding="utf-8") as f:
+                snapshots.append((json.load(f), _pid_alive(pid)))
+        except (ValueError, OSError):
+            continue
+    return snapshots
+
+
+def render() -> str:
+    """This process's metrics, or every worker's when they share METRICS_DIR."""
+    if not METRICS_DIR:
+        return REGISTRY.render()
+    write_snapshot()
+    return REGISTRY.render_merged(read_snapshots())
+
+
+class SnapshotJob:
+    def __init__(self, interval: float = METRICS_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="metrics-snapshots")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # the last requests of this worker stay in the totals
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception("final metrics snapshot failed")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(write_snapshot)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("metrics snapshot failed")
+
+
+snapshots = SnapshotJob()
+
+
+def _observe_query(name: str, seconds: float, rows: int) -> None:
+    db_query_duration.observe(seconds, name)
+
+
+db.query_observers.append(_observe_query)
+
+
+# callables(method, route, stats) run after every request; tests use this to
+# bound statements per endpoint
+request_observers: List[Callable[[str, str, db.RequestStats], None]] = []
+
+
+def debug_headers(stats: db.RequestStats) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"x-db-statements", str(stats.statements).encode()),
+        (b"x-db-round-trips", str(stats.round_trips).encode()),
+        (b"x-db-connections", str(stats.connections).encode()),
+        (b"x-db-time-ms", f"{stats.db_seconds * 1000:.2f}".encode()),
+    ]
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    # keep cardinality bounded: static mounts collapse to their prefix
+    root_path = scope.get("root_path") or ""
+    return f"{root_path}/*" if root_path else "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, debug: Optional[bool] = None):
+        self.app = app
+        self.debug = APP_DEBUG if debug is None else debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = db.RequestStats()
+        token = db.request_stats.set(stats)
+        status = {"code": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.debug:
+                    # the handler has returned: the counts are complete
+                    message = {**message, "headers": [*message.get("headers", []), *debug_headers(stats)]}
+            elif message["type"] == "http.response.body":
+                status["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            db.request_stats.reset(token)
+            method = scope.get("method", "")
+            route = route_label(scope)
+            http_requests_total.inc(method, route, str(status["code"]))
+            http_request_duration.observe(elapsed, method, route)
+            http_request_db_time.observe(stats.db_seconds, method, route)
+            http_request_python_time.observe(max(0.0, elapsed - stats.db_seconds), method, route)
+            http_request_db_rows.observe(stats.rows, method, route)
+            http_request_db_statements.observe(stats.statements, method, route)
+            http_response_bytes.observe(status["bytes"], method, route)
+            for observer in request_observers:
+                observer(method, route, stats)
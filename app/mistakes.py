@@ -0,0 +1,101 @@
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List
+
+# Error tags sent with attempts are normalized and stored as integer ids from
+# the error_tag dictionary (migration 0011). Tags are free text from clients,
+# so each user may introduce only a few new ones per day; the rest are
+# dropped. The trigger on task_attempt keeps
+# user_error_tag_stats current, so GET /progress/mistakes reads a handful of
+# counter rows instead of scanning attempts.
+
+logger = logging.getLogger("app.mistakes")
+
+MAX_TAGS_PER_ATTEMPT = 10
+MAX_TAG_LENGTH = 64
+ERROR_TAG_DAILY_NEW = int(os.getenv("ERROR_TAG_DAILY_NEW", "20") or 0)
+_INVALID = re.compile(r"[^a-z0-9_:./-]+")
+
+
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    """Lowercase, collapse separators, drop empties and duplicates, keep order."""
+    seen: Dict[str, None] = {}
+    for raw in tags:
+        tag = _INVALID.sub("_", str(raw).strip().lower()).strip("_")[:MAX_TAG_LENGTH]
+        if tag:
+            seen.setdefault(tag, None)
+        if len(seen) >= MAX_TAGS_PER_ATTEMPT:
+            break
+    return list(seen)
+
+
+class TagDictionary:
+    """Process-local tag -> id cache over error_tag; ids never change once assigned."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, cur, tags: List[str], user_id: int) -> List[int]:
+        missing = [t for t in tags if t not in self._ids]
+        if missing:
+            found = self._resolve(cur, missing, user_id)
+            with self._lock:
+                self._ids.update(found)
+        return [self._ids[t] for t in tags if t in self._ids]
+
+    def _resolve(self, cur, tags: List[str], user_id: int) -> Dict[str, int]:
+        # look up first: only tags nobody has used yet reach the INSERT, so a
+        # cold cache after a deploy does not spend identity values on conflicts
+        cur.execute("SELECT id, tag FROM error_tag WHERE tag = ANY(%s)", (tags,))
+        found = {tag: tag_id for tag_id, tag in cur.fetchall()}
+        new = [t for t in tags if t not in found]
+        if new:
+            cur.execute(
+                """
+                WITH quota AS (
+                    SELECT GREATEST(%s - count(*), 0) AS n
+                    FROM error_tag
+                    WHERE created_by = %s AND created_at > now() - interval '1 day'
+                )
+                INSERT INTO error_tag (tag, created_by)
+                SELECT t.tag, %s
+                FROM unnest(%s::text[]) WITH ORDINALITY AS t(tag, ord)
+                WHERE t.ord <= (SELECT n FROM quota)
+                ON CONFLICT (tag) DO NOTHING
+                RETURNING id, tag
+                """,
+                (ERROR_TAG_DAILY_NEW, user_id, user_id, new),
+            )
+            found.update({tag: tag_id for tag_id, tag in cur.fetchall()})
+            if len(found) < len(tags):
+                # over the user's quota, or inserted concurrently (counted next time)
+                logger.info("Dropping error tags %s for user %s", [t for t in tags if t not in found], user_id)
+        return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+
+tag_dictionary = TagDictionary()
+
+
+def top_mistakes(cur, user_id: int, limit: int = 5) -> List[dict]:
+    cur.execute(
+        """
+        SELECT e.tag, s.occurrences, decayed_error_weight(s.weight, s.last_seen_at) AS recent, s.last_seen_at
+        FROM user_error_tag_stats s
+        JOIN error_tag e ON e.id = s.tag_id
+        WHERE s.user_id = %s
+        ORDER BY recent DESC, s.occurrences DESC
+        LIMIT %s
+        """,
+        (user_id, limit),
+    )
+    return [
+        {"tag": tag, "occurrences": occurrences, "recentWeight": round(float(recent), 3), "lastSeenAt": last_seen}
+        for tag, occurrences, recent, last_seen in cur.fetchall()
+    ]
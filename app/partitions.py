@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from psycopg import sql
+
+from app import db
+
+# task_attempt is range-partitioned by month on submitted_at (migration 0010).
+# A periodic job keeps partitions created ahead of time and folds partitions
+# older than the retention window into task_attempt_daily (per user, task and
+# UTC day) before detaching them, so hot-path scans only see recent months.
+
+logger = logging.getLogger("app.partitions")
+
+PARTITION_JOB_INTERVAL = float(os.getenv("PARTITION_JOB_INTERVAL", "3600") or 3600)
+PARTITION_MONTHS_AHEAD = int(os.getenv("TASK_ATTEMPT_MONTHS_AHEAD", "2") or 2)
+# Months of raw attempts kept, counting the current one; 0 disables rollups
+RETENTION_MONTHS = int(os.getenv("TASK_ATTEMPT_RETENTION_MONTHS", "12") or 0)
+# Detached partitions are dropped unless kept for archiving
+DROP_DETACHED = os.getenv("TASK_ATTEMPT_DROP_DETACHED", "1") != "0"
+
+_PARTITION_NAME = re.compile(r"^task_attempt_p(\d{4})(\d{2})$")
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_month(name: str) -> Optional[date]:
+    m = _PARTITION_NAME.match(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def expired_months(months: List[date], today: date, retention: int = RETENTION_MONTHS) -> List[date]:
+    """Partition months entirely older than the retention window."""
+    if retention <= 0:
+        return []
+    cutoff = add_months(today.replace(day=1), -(retention - 1))
+    return sorted(m for m in months if m < cutoff)
+
+
+def ensure_partitions(cur, today: date, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    first = today.replace(day=1)
+    created = []
+    for i in range(months_ahead + 1):
+        cur.execute("SELECT create_task_attempt_partition(%s)", (add_months(first, i),))
+        created.append(cur.fetchone()[0])
+    return created
+
+
+def list_partitions(cur) -> List[Tuple[str, date]]:
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'task_attempt'::regclass
+        """
+    )
+    return sorted((name, month) for (name,) in cur.fetchall() if (month := partition_month(name)) is not None)
+
+
+def roll_up_partition(conn, name: str, drop: bool = DROP_DETACHED) -> int:
+    """Fold one partition into task_attempt_daily and detach it, atomically."""
+    table = sql.Identifier(name)
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    """
+                    INSERT INTO task_attempt_daily AS d (user_id, task_id, day, attempts, correct)
+                    SELECT user_id, task_id, (submitted_at AT TIME ZONE 'UTC')::date,
+                           COUNT(*), COUNT(*) FILTER (WHERE is_correct)
+                    FROM {}
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (user_id, task_id, day) DO UPDATE
+                    SET attempts = d.attempts + EXCLUDED.attempts,
+                        correct = d.correct + EXCLUDED.correct
+                    """
+                ).format(table)
+            )
+            rows = cur.rowcount
+            cur.execute(sql.SQL("ALTER TABLE task_attempt DETACH PARTITION {}").format(table))
+            if drop:
+                cur.execute(sql.SQL("DROP TABLE {}").format(table))
+    return rows
+
+
+def run_partition_jobs(today: Optional[date] = None) -> dict:
+    today = today or datetime.now(timezone.utc).date()
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            ensure_partitions(cur, today)
+            partitions = dict((month, name) for name, month in list_partitions(cur))
+        rolled = []
+        for month in expired_months(list(partitions), today):
+            rows = roll_up_partition(conn, partitions[month])
+            logger.info("rolled up %s into %d daily row(s)", partitions[month], rows)
+            rolled.append(partitions[month])
+    return {"partitions": len(partitions) - len(rolled), "rolled_up": rolled}
+
+
+class PartitionJobs:
+    def __init__(self, interval: float = PARTITION_JOB_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="partition-jobs")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(run_partition_jobs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("partition jobs failed")
+            await asyncio.sleep(self.interval)
+
+
+jobs = PartitionJobs()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.partitions", description="task_attempt partition maintenance")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run", help="create upcoming partitions and roll up expired ones")
+    sub.add_parser("list", help="print attached monthly partitions")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cmd == "run":
+        print(run_partition_jobs())
+    elif args.cmd == "list":
+        with db.connect() as conn:
+            with conn.cursor() as cur:
+                for name, month in list_partitions(cur):
+                    print(f"{name}\t{month:%Y-%m}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import psycopg
+
+from app import db
+
+logger = logging.getLogger("app.ratelimit")
+
+# Per-key token buckets (burst control) and per-day attempt quotas (free plan).
+# The default in-process backend costs a dict lookup under a lock; the
+# Postgres backend (RATE_LIMIT_BACKEND=postgres) shares state across workers
+# and instances at the price of one round trip per check, on a pooled
+# connection. app.serve switches to it when it runs more than one worker.
+
+
+class Rule(NamedTuple):
+    rate: float  # tokens refilled per second
+    burst: int  # bucket capacity
+    free_daily: Optional[int] = None  # daily quota for free-plan callers, None = unlimited
+
+
+def _env_rule(name: str, rate: float, burst: int, free_daily: Optional[int] = None) -> Rule:
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    daily = os.getenv(f"{prefix}_FREE_DAILY")
+    return Rule(
+        float(os.getenv(f"{prefix}_RATE", rate)),
+        int(os.getenv(f"{prefix}_BURST", burst)),
+        (int(daily) or None) if daily is not None else free_daily,
+    )
+
+
+RULES: Dict[str, Rule] = {
+    "auth_tg": _env_rule("auth_tg", rate=1.0, burst=10),
+    "attempts": _env_rule("attempts", rate=2.0, burst=30, free_daily=300),
+    "tasks_next": _env_rule("tasks_next", rate=5.0, burst=50, free_daily=600),
+}
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    reason: Optional[str] = None
+    retry_after: int = 0
+
+
+def _seconds_to_midnight(now: datetime) -> int:
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+class MemoryBackend:
+    MAX_KEYS = 200_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # least recently used first; evicting one refills that caller's bucket
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._daily: Dict[str, int] = {}
+        self._day = None
+
+    def take_token(self, key: str, rule: Rule, now: float) -> Tuple[bool, float]:
+        """Return (allowed, seconds until a token is available)."""
+        with self._lock:
+            tokens, last = self._buckets.get(key, (float(rule.burst), now))
+            tokens = min(float(rule.burst), tokens + (now - last) * rule.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1.0 - tokens) / rule.rate
+
+    def count_daily(self, key: str, day, limit: int) -> bool:
+        with self._lock:
+            if day != self._day:
+                self._daily = {}
+                self._day = day
+            used = self._daily.get(key, 0)
+            if used >= limit:
+                return False
+            self._daily[key] = used + 1
+            return True
+
+    def release_daily(self, key: str, day) -> None:
+        with self._lock:
+            if day == self._day and self._daily.get(key, 0) > 0:
+                self._daily[key] -= 1
+
+
+class PostgresBackend:
+    """Shared state in UNLOGGED tables (migration 0009); losing it on crash is fine."""
+
+    def take_token(self, key: str, rule: Rule, now: float) -> Tuple[bool, float]:
+        with db.connect() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO rate_limit_bucket AS b (key, tokens, updated_at, allowed)
+                VALUES (%(key)s, %(burst)s - 1, now(), true)
+                ON CONFLICT (key) DO UPDATE SET
+                    tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s)
+                             - CASE WHEN LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1
+                                    THEN 1 ELSE 0 END,
+                    allowed = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1,
+                    updated_at = now()
+                RETURNING allowed, tokens
+                """,
+                {"key": key, "burst": float(rule.burst), "rate": rule.rate},
+            )
+            allowed, tokens = cur.fetchone()
+        return allowed, 0.0 if allowed else (1.0 - float(tokens)) / rule.rate
+
+    def count_daily(self, key: str, day, limit: int) -> bool:
+        with db.connect() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO rate_limit_daily AS d (key, day, used)
+                VALUES (%s, %s, 1)
+                ON CONFLICT (key, day) DO UPDATE SET used = d.used + 1
+                WHERE d.used < %s
+                RETURNING used
+                """,
+                (key, day, limit),
+            )
+            return cur.fetchone() is not None
+
+    def release_daily(self, key: str, day) -> None:
+        with db.connect() as conn, conn.cursor() as cur:
+            cur.execute("UPDATE rate_limit_daily SET used = used - 1 WHERE key = %s AND day = %s AND used > 0", (key, day))
+
+
+class RateLimiter:
+    def __init__(self, backend=None, rules: Optional[Dict[str, Rule]] = None, enabled: bool = True):
+        self.backend = backend or MemoryBackend()
+        self.rules = rules if rules is not None else RULES
+        self.enabled = enabled
+
+    def check(self, endpoint: str, subject: str, plan: Optional[str] = None) -> Decision:
+        rule = self.rules.get(endpoint)
+        if not self.enabled or rule is None:
+            return Decision(True)
+        key = f"{endpoint}:{subject}"
+        try:
+            # quota first: requests refused for the day do not drain the burst,
+            # and a throttled request hands its quota unit back
+            quota = rule.free_daily is not None and plan != "pro"
+            if quota:
+                now = datetime.now(timezone.utc)
+                if not self.backend.count_daily(key, now.date(), rule.free_daily):
+                    return Decision(False, "daily_quota_exceeded", _seconds_to_midnight(now))
+            allowed, wait = self.backend.take_token(key, rule, time.monotonic())
+            if not allowed:
+                if quota:
+                    self.backend.release_daily(key, now.date())
+                return Decision(False, "rate_limited", max(1, int(wait + 0.999)))
+        except psycopg.Error:
+            # a broken shared backend must not take the API down with it
+            logger.exception("rate limit backend failed; allowing request")
+        return Decision(True)
+
+
+def limiter_from_env() -> RateLimiter:
+    backend_name = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    backend = PostgresBackend() if backend_name == "postgres" else MemoryBackend()
+    return RateLimiter(backend, enabled=os.getenv("RATE_LIMIT_ENABLED", "1") != "0")
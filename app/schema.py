@@ -0,0 +1,104 @@
+import logging
+import threading
+from typing import Dict, FrozenSet, List, Mapping, Optional
+
+from app import db
+
+# Live schema vs. what the code expects at the migration head (migrations/,
+# the only tree). The columns are read once at startup: drift is logged and
+# reported by readiness, and the few queries that depend on optional columns
+# get their variant picked here instead of probing information_schema per
+# request. Until a snapshot is loaded (tests, scripts) the head layout is
+# assumed; readiness keeps retrying the snapshot if it failed at startup.
+
+logger = logging.getLogger("app.schema")
+
+# Columns the handlers and jobs read or write, by table, at the current head
+EXPECTED_COLUMNS: Dict[str, FrozenSet[str]] = {
+    "app_user": frozenset({"id", "email", "tg_user_id", "plan", "pro_until", "entitlements"}),
+    "lesson": frozenset({"id", "title", "topic", "metadata"}),
+    "task": frozenset({"id", "lesson_id", "content", "answer", "topic"}),
+    "task_attempt": frozenset({"id", "user_id", "task_id", "submitted_at", "is_correct", "response",
+                               "score", "error_tag_ids"}),
+    "task_attempt_daily": frozenset({"day", "user_id", "task_id", "attempts", "correct"}),
+    "lesson_progress": frozenset({"user_id", "lesson_id", "attempts", "correct", "accuracy", "mastered"}),
+    "topic_stats": frozenset({"user_id", "topic", "attempts", "correct", "accuracy"}),
+    "study_session": frozenset({"user_id", "started_at", "ended_at", "stats", "session_key"}),
+    "error_tag": frozenset({"id", "tag", "created_by", "created_at"}),
+    "telegram_update_inbox": frozenset({"update_id", "payload", "received_at", "processed_at", "attempts",
+                                        "last_error", "next_attempt_at"}),
+    "user_error_tag_stats": frozenset({"user_id", "tag_id", "occurrences", "weight", "last_seen_at"}),
+}
+
+
+class Schema:
+    """Column layout of the tables the app uses, and the query variants it implies."""
+
+    def __init__(self, columns: Optional[Mapping[str, FrozenSet[str]]] = None):
+        self.loaded = columns is not None
+        self.columns: Dict[str, FrozenSet[str]] = dict(EXPECTED_COLUMNS if columns is None else columns)
+        lesson = self.columns.get("lesson", frozenset())
+        # databases created from the pre-consolidation tree may carry coded topic columns
+        self.lesson_topic = "l.topic_code" if "topic_code" in lesson else "l.topic"
+        self.lesson_subtopic = "l.subtopic_code" if "subtopic_code" in lesson else "NULL::text"
+
+    def drift(self) -> List[str]:
+        problems = []
+        for table, expected in sorted(EXPECTED_COLUMNS.items()):
+            actual = self.columns.get(table)
+            if actual is None:
+                problems.append(f"missing table {table}")
+                continue
+            problems.extend(f"missing column {table}.{c}" for c in sorted(expected - actual))
+        return problems
+
+
+def load(cur) -> Schema:
+    cur.execute(
+        """
+        SELECT table_name, array_agg(column_name::text)
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = ANY(%s)
+        GROUP BY table_name
+        """,
+        (sorted(EXPECTED_COLUMNS),),
+    )
+    return Schema({table: frozenset(cols) for table, cols in cur.fetchall()})
+
+
+current = Schema()
+
+
+def refresh() -> Schema:
+    """Snapshot the live schema at startup and switch the query variants over to it."""
+    global current
+    with db.connect() as conn, db.query_name("schema_snapshot"):
+        with conn.cursor() as cur:
+            current = load(cur)
+    problems = current.drift()
+    if problems:
+        logger.error("schema drift against migration head: %s", "; ".join(problems))
+    return current
+
+
+_retrying = threading.Lock()
+
+
+def _retry_refresh() -> None:
+    try:
+        refresh()
+    except Exception as exc:
+        logger.warning("schema snapshot retry failed: %s", exc)
+    finally:
+        _retrying.release()
+
+
+def check() -> dict:
+    if not current.loaded:
+        # the startup snapshot failed (DB down at boot): retry off the probe's
+        # thread, so readiness recovers once the database is back
+        if _retrying.acquire(blocking=False):
+            threading.Thread(target=_retry_refresh, name="schema-refresh", daemon=True).start()
+        return {"ok": False, "error": "not_loaded"}
+    problems = current.drift()
+    return {"ok": not problems, "drift": problems}
@@ -0,0 +1,241 @@
+import argparse
+import gc
+import glob
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+from app import db, metrics
+
+# Production launcher: one listening socket bound by the master, N forked
+# uvicorn workers accepting on it. Immutable content is loaded before the
+# fork so workers share those pages copy-on-write, and the Postgres pool of
+# each worker is sized so the whole deployment stays within
+# DB_MAX_CONNECTIONS. SIGTERM/SIGINT drain every worker (uvicorn graceful
+# shutdown + app lifespan) before the master exits; crashed workers are
+# replaced. Workers write metric snapshots to a directory shared with their
+# siblings, so /metrics reports the whole deployment whichever worker answers.
+#
+#   python -m app.serve [--workers N] [--host H] [--port P]
+
+logger = logging.getLogger("app.serve")
+
+APP_WORKERS = int(os.getenv("APP_WORKERS", os.getenv("WEB_CONCURRENCY", "0")) or 0)
+# Connections the deployment may hold in total, across all workers
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "40") or 40)
+# Direct connections per worker outside the pool (readiness probe, EXPLAIN sampler)
+DB_RESERVED_PER_WORKER = int(os.getenv("DB_RESERVED_PER_WORKER", "2") or 0)
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "20") or 20)
+# A worker that dies sooner than this after spawning delays its replacement
+RESPAWN_BACKOFF = 1.0
+
+
+def default_workers() -> int:
+    return APP_WORKERS if APP_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def pool_sizes(workers: int, total: int = DB_MAX_CONNECTIONS,
+               reserved: int = DB_RESERVED_PER_WORKER, min_size: int = db.DB_POOL_MIN_SIZE) -> Tuple[int, int]:
+    """(min, max) pool size per worker so workers * (max + reserved) <= total."""
+    per_worker = max(1, total // max(1, workers) - reserved)
+    return min(min_size, per_worker), per_worker
+
+
+def rate_limit_backend(workers: int, configured: Optional[str] = None, enabled: bool = True) -> str:
+    """In-process buckets would multiply every limit and quota by the worker count."""
+    configured = (configured or "").lower()
+    if workers <= 1 or not enabled:
+        return configured or "memory"
+    if configured in ("", "postgres"):
+        return "postgres"
+    raise SystemExit(f"RATE_LIMIT_BACKEND={configured} keeps limits per process; "
+                     f"use RATE_LIMIT_BACKEND=postgres with {workers} workers")
+
+
+def metrics_dir(configured: Optional[str] = metrics.METRICS_DIR) -> Tuple[str, bool]:
+    """(directory for worker snapshots, whether it is ours to remove)."""
+    if not configured:
+        return tempfile.mkdtemp(prefix="app-metrics-"), True
+    os.makedirs(configured, exist_ok=True)
+    # snapshots of a previous run would be added to this one's totals
+    for path in glob.glob(os.path.join(configured, "*.json")):
+        os.unlink(path)
+    return configured, False
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Import the app and load immutable content in the master, before forking."""
+    from app import content, content_store, health, main
+
+    content.exercise_bank()
+    content.exercise_index()
+    health.expected_heads()
+    # mapped here, the lesson store is inherited by every worker: one copy in memory
+    try:
+        content_store.store.build(main.dumps_json)
+    except Exception as exc:
+        logger.warning("content store not built before fork: %s", exc)
+    # catalog documents come from the DB; the pool is not open in the master,
+    # so this uses short-lived direct connections that are closed before fork
+    for group in ("grammar", "vocabulary"):
+        try:
+            main.catalog_tree(group)
+        except Exception as exc:
+            logger.warning("catalog %s not preloaded: %s", group, exc)
+    # keep the preloaded objects out of GC passes in the workers, which would
+    # otherwise touch (and copy) every shared page
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+class Arbiter:
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: float = GRACEFUL_TIMEOUT):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, float] = {}  # pid -> spawned at
+        self.stopping = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve()
+            except BaseException:
+                logger.exception("worker %s crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def _serve(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+            signal.signal(sig, signal.SIG_DFL)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            timeout_graceful_shutdown=self.graceful_timeout,
+            log_level=os.getenv("LOG_LEVEL", "info"),
+        )
+        # uvicorn installs its own SIGTERM/SIGINT handlers and drains on them
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def reap(self) -> Dict[int, int]:
+        exited: Dict[int, int] = {}
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.children:
+                self.children.pop(pid)
+                exited[pid] = os.waitstatus_to_exitcode(status)
+        return exited
+
+    def run(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+            signal.signal(sig, self._stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("master %s serving with %d workers", os.getpid(), self.workers)
+
+        failed = 0
+        while not self.stopping:
+            now = time.monotonic()
+            spawned = dict(self.children)
+            for pid, code in self.reap().items():
+                logger.warning("worker %s exited with %s; replacing it", pid, code)
+                if now - spawned.get(pid, 0.0) < RESPAWN_BACKOFF:
+                    failed += 1
+                    time.sleep(min(RESPAWN_BACKOFF * failed, 10.0))
+                else:
+                    failed = 0
+                if not self.stopping:
+                    self.spawn()
+            time.sleep(0.2)
+        return self.shutdown()
+
+    def shutdown(self) -> int:
+        logger.info("stopping %d workers", len(self.children))
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        # uvicorn's own graceful timeout plus time for the lifespan shutdown
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        code = 0
+        while self.children and time.monotonic() < deadline:
+            for pid, status in self.reap().items():
+                # uvicorn re-raises the captured SIGTERM once it has drained
+                if status != -signal.SIGTERM:
+                    code = code or status
+            time.sleep(0.05)
+        for pid in list(self.children):
+            logger.error("worker %s did not stop in time; killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+            code = code or 1
+        self.reap()
+        self.sock.close()
+        return code
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.serve")
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+
+    workers = max(1, args.workers)
+    db.DB_POOL_MIN_SIZE, db.DB_POOL_MAX_SIZE = pool_sizes(workers)
+    logger.info("pool per worker: min %d max %d (%d workers, %d connections total)",
+                db.DB_POOL_MIN_SIZE, db.DB_POOL_MAX_SIZE, workers, DB_MAX_CONNECTIONS)
+
+    # read by app.main at import, which preload() triggers
+    os.environ["RATE_LIMIT_BACKEND"] = rate_limit_backend(
+        workers, os.getenv("RATE_LIMIT_BACKEND"), os.getenv("RATE_LIMIT_ENABLED", "1") != "0")
+    logger.info("rate limit backend: %s", os.environ["RATE_LIMIT_BACKEND"])
+
+    metrics.METRICS_DIR, owned = metrics_dir()
+
+    sock = bind_socket(args.host, args.port)
+    app = preload()
+    try:
+        return Arbiter(app, sock, workers, args.graceful_timeout).run()
+    finally:
+        if owned:
+            shutil.rmtree(metrics.METRICS_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Compact stateless session tokens issued by /auth/tg:
+#   v1.<base64url(json claims)>.<base64url(hmac-sha256)>
+# Claims: uid, tg, plan (effective), ent (entitlements), exp (unix seconds).
+
+TOKEN_VERSION = "v1"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "900") or 900)
+
+_secret_cache: dict = {}
+
+
+class SessionError(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _session_secret() -> bytes:
+    explicit = os.getenv("SESSION_SECRET", "")
+    bot_token = os.getenv("BOT_TOKEN", "")
+    key = (explicit, bot_token)
+    secret = _secret_cache.get(key)
+    if secret is None:
+        if explicit:
+            secret = explicit.encode()
+        elif bot_token:
+            secret = hmac.new(b"engtrain-session", bot_token.encode(), hashlib.sha256).digest()
+        else:
+            # dev/local: tokens are only valid within this process
+            secret = secrets.token_bytes(32)
+        _secret_cache.clear()
+        _secret_cache[key] = secret
+    return secret
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: str) -> str:
+    return _b64encode(hmac.new(_session_secret(), signing_input.encode("ascii"), hashlib.sha256).digest())
+
+
+def sign_id(value: str) -> str:
+    """Short MAC for ids the server hands out, checkable by any worker."""
+    return _b64encode(hmac.new(_session_secret(), value.encode("utf-8"), hashlib.sha256).digest()[:12])
+
+
+def effective_plan(plan: str, pro_until: Optional[datetime], now: Optional[float] = None) -> str:
+    """'pro' only while pro_until is ahead; the billing sweep may not have run yet."""
+    if plan == "pro" and pro_until is not None and pro_until.timestamp() <= (time.time() if now is None else now):
+        return "free"
+    return plan
+
+
+def issue_token(
+    user_id: int,
+    tg_user_id: Optional[int],
+    plan: str,
+    entitlements: Optional[dict],
+    pro_until: Optional[datetime] = None,
+    ttl: Optional[int] = None,
+) -> Tuple[str, int]:
+    """Return (token, exp). A pro session never outlives pro_until."""
+    now = time.time()
+    exp = int(now) + (SESSION_TTL_SECONDS if ttl is None else ttl)
+    plan = effective_plan(plan, pro_until, now)
+    if plan == "pro" and pro_until is not None:
+        exp = min(exp, int(pro_until.timestamp()))
+    claims = {"uid": user_id, "tg": tg_user_id, "plan": plan, "ent": entitlements or {}, "exp": exp}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{TOKEN_VERSION}.{payload}"
+    return f"{signing_input}.{_sign(signing_input)}", exp
+
+
+def verify_token(token: str, now: Optional[float] = None) -> dict:
+    """Return the token claims or raise SessionError."""
+    try:
+        version, payload, signature = token.split(".")
+    except ValueError:
+        raise SessionError("invalid_session")
+    if version != TOKEN_VERSION:
+        raise SessionError("invalid_session")
+    if not hmac.compare_digest(signature, _sign(f"{version}.{payload}")):
+        raise SessionError("invalid_session")
+    try:
+        claims = json.loads(_b64decode(payload))
+        exp = int(claims["exp"])
+        int(claims["uid"])
+    except Exception:
+        raise SessionError("invalid_session")
+    if exp <= (time.time() if now is None else now):
+        raise SessionError("session_expired")
+    return claims
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, value = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not value.strip():
+        return None
+    return value.strip()
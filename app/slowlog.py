@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg
+from psycopg import sql
+
+from app import db
+
+# Slow statement capture. Every statement executed through db.connect() that
+# takes longer than DB_SLOW_QUERY_MS is logged with the shape of its
+# parameters (types and sizes, never values) and aggregated per statement
+# fingerprint. A background job periodically re-runs EXPLAIN (ANALYZE,
+# BUFFERS) for the top read-only statements inside a rolled-back transaction
+# and keeps the latest plan summary for GET /admin/db/slow.
+
+logger = logging.getLogger("app.slowlog")
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200") or 0)
+DB_EXPLAIN_INTERVAL = float(os.getenv("DB_EXPLAIN_INTERVAL", "300") or 300)
+DB_EXPLAIN_TOP = int(os.getenv("DB_EXPLAIN_TOP", "5") or 5)
+DB_EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_EXPLAIN_TIMEOUT_MS", "5000") or 5000)
+MAX_STATEMENTS = 200
+
+_WS = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+UPDATE)\b", re.IGNORECASE)
+
+
+def param_shape(params: Any) -> Any:
+    """Describe parameters without their values: ``(1, "abc")`` -> ``["int", "str(3)"]``."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: param_shape(v) for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_value_shape(v) for v in params]
+    return _value_shape(params)
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    name = type(value).__name__
+    if isinstance(value, (str, bytes)):
+        return f"{name}({len(value)})"
+    if isinstance(value, (list, tuple, set, dict)):
+        return f"{name}[{len(value)}]"
+    if hasattr(value, "obj"):  # psycopg Json/Jsonb wrappers
+        return f"{name}({type(value.obj).__name__})"
+    return name
+
+
+def statement_sql(query: Any, cursor: Optional[psycopg.Cursor] = None) -> str:
+    """The statement as sent, line breaks included (``--`` comments end at them)."""
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if isinstance(query, sql.Composable):
+        return query.as_string(cursor.connection if cursor is not None else None)
+    return str(query)
+
+
+def statement_text(query: Any, cursor: Optional[psycopg.Cursor] = None) -> str:
+    """One-line form for fingerprints and the report; not valid SQL to re-run."""
+    return _WS.sub(" ", statement_sql(query, cursor)).strip()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = DB_SLOW_QUERY_MS, max_statements: int = MAX_STATEMENTS):
+        self.threshold = threshold_ms / 1000.0
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+
+    def observe(self, cursor, query, params, seconds: float) -> None:
+        if self.threshold <= 0 or seconds < self.threshold:
+            return
+        try:
+            raw = statement_sql(query, cursor)
+        except Exception:
+            return
+        text = _WS.sub(" ", raw).strip()
+        key = fingerprint(text)
+        shape = param_shape(params)
+        name = db.current_query.get()
+        logger.warning("slow statement %.1fms [%s] %s params=%s", seconds * 1000, name or key, text[:500], shape)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_statements:
+                    # make room by forgetting the cheapest statement
+                    cheapest = min(self._entries, key=lambda k: self._entries[k]["total_ms"])
+                    del self._entries[cheapest]
+                entry = self._entries[key] = {
+                    "fingerprint": key, "query": name, "statement": text, "count": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "explain": None,
+                }
+            ms = seconds * 1000
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["last_seen"] = time.time()
+            entry["param_shape"] = shape
+            # values are kept in memory only, for EXPLAIN; they never leave the process
+            entry["_params"] = params
+            entry["_sql"] = raw
+
+    def top(self, n: int = 20) -> List[dict]:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["total_ms"], reverse=True)[:n]
+            return [{k: v for k, v in e.items() if not k.startswith("_")} for e in entries]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def explain_top(self, n: int = DB_EXPLAIN_TOP) -> int:
+        with self._lock:
+            candidates = sorted(self._entries.values(), key=lambda e: e["total_ms"], reverse=True)
+            candidates = [
+                (e["fingerprint"], e["_sql"], e.get("_params"))
+                for e in candidates
+                if _READ_ONLY.match(e["statement"]) and not _WRITES.search(e["statement"])
+            ][:n]
+        if not candidates:
+            return 0
+        explained = 0
+        # a plain connection: EXPLAIN runs must not feed back into the log;
+        # bounded like the statements, so a stalled server cannot hang the sampler
+        timeout = max(1, DB_EXPLAIN_TIMEOUT_MS // 1000)
+        with psycopg.connect(db.DB_URL, connect_timeout=timeout) as conn:
+            for key, text, params in candidates:
+                try:
+                    plan = explain(conn, text, params)
+                except psycopg.Error as exc:
+                    conn.rollback()
+                    plan = {"error": str(exc).strip()}
+                with self._lock:
+                    if key in self._entries:
+                        self._entries[key]["explain"] = plan
+                explained += 1
+        return explained
+
+
+def explain(conn: psycopg.Connection, text: str, params: Any) -> dict:
+    """EXPLAIN (ANALYZE, BUFFERS) one statement inside a rolled-back transaction."""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SET LOCAL statement_timeout = {}").format(sql.Literal(DB_EXPLAIN_TIMEOUT_MS)))
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + text, params)
+        doc = cur.fetchone()[0][0]
+    conn.rollback()
+    return summarize_plan(doc)
+
+
+def summarize_plan(doc: dict) -> dict:
+    root = doc.get("Plan", {})
+    return {
+        "sampled_at": time.time(),
+        "planning_ms": doc.get("Planning Time"),
+        "execution_ms": doc.get("Execution Time"),
+        "node": root.get("Node Type"),
+        "rows": root.get("Actual Rows"),
+        "shared_hit": root.get("Shared Hit Blocks"),
+        "shared_read": root.get("Shared Read Blocks"),
+        "seq_scans": sorted(set(_seq_scans(root))),
+        "plan": root,
+    }
+
+
+def _seq_scans(node: dict):
+    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+        yield node["Relation Name"]
+    for child in node.get("Plans", ()):
+        yield from _seq_scans(child)
+
+
+class ExplainSampler:
+    def __init__(self, log: SlowQueryLog, interval: float = DB_EXPLAIN_INTERVAL):
+        self.log = log
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="explain-sampler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.log.explain_top)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("EXPLAIN sampling failed")
+
+
+slow_log = SlowQueryLog()
+sampler = ExplainSampler(slow_log)
+db.statement_observers.append(slow_log.observe)
@@ -0,0 +1,297 @@
+import asyncio
+import hmac
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import psycopg
+from psycopg.types.json import Json
+
+from app import db
+from app.session import sign_id
+
+# Study sessions are aggregated in process memory, keyed by session id:
+# heartbeats and attempts only touch a dict entry. A session is queued for
+# writing when it ends or after STUDY_SESSION_TIMEOUT seconds without a
+# heartbeat, and queued sessions are written to study_session in one
+# statement per batch. Rows are merged on session_key (migration 0012), so a
+# session whose requests were served by several workers, or that was flushed
+# and then resumed, adds up instead of being overwritten. Time on task is kept
+# as spans and merged as their union: workers that each saw some of the
+# heartbeats do not count the same minutes twice. Session ids carry a MAC, so
+# a worker only opens state for ids this deployment issued.
+
+logger = logging.getLogger("app.study")
+
+STUDY_SESSION_TIMEOUT = float(os.getenv("STUDY_SESSION_TIMEOUT", "300") or 300)
+# Longest gap between two events still counted as time on task
+STUDY_ACTIVE_GAP = float(os.getenv("STUDY_ACTIVE_GAP", "60") or 60)
+STUDY_FLUSH_INTERVAL = float(os.getenv("STUDY_FLUSH_INTERVAL", "10") or 10)
+STUDY_FLUSH_BATCH = int(os.getenv("STUDY_FLUSH_BATCH", "500") or 500)
+
+
+class SessionMismatch(Exception):
+    pass
+
+
+def session_id(key: str) -> str:
+    """Client-facing id for a session key: the key plus its MAC."""
+    return f"{key}.{sign_id('study:' + key)}"
+
+
+def parse_session_id(raw: str) -> Optional[str]:
+    """The session key of an id issued by session_id(), or None."""
+    key, _, mac = str(raw).partition(".")
+    try:
+        key = str(uuid.UUID(key))
+    except ValueError:
+        return None
+    if not hmac.compare_digest(mac, sign_id("study:" + key)):
+        return None
+    return key
+
+
+def union_spans(spans: Sequence[Sequence[float]]) -> List[List[float]]:
+    merged: List[List[float]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+class SessionAggregate:
+    __slots__ = ("key", "user_id", "started_at", "last_seen", "ended_at", "attempts", "correct",
+                 "spans", "heartbeats", "topics")
+
+    def __init__(self, key: str, user_id: int, now: float):
+        self.key = key
+        self.user_id = user_id
+        self.started_at = now
+        self.last_seen = now
+        self.ended_at: Optional[float] = None
+        self.attempts = 0
+        self.correct = 0
+        # [start, end] of time on task, disjoint and ascending
+        self.spans: List[List[float]] = []
+        self.heartbeats = 0
+        self.topics: Dict[str, int] = {}
+
+    @property
+    def active_seconds(self) -> float:
+        return sum(hi - lo for lo, hi in self.spans)
+
+    def touch(self, now: float, gap_cap: float = STUDY_ACTIVE_GAP) -> None:
+        gap = now - self.last_seen
+        if gap > 0:
+            start = now - min(gap, gap_cap)
+            if self.spans and start <= self.spans[-1][1]:
+                self.spans[-1][1] = now
+            else:
+                self.spans.append([start, now])
+            self.last_seen = now
+
+    def merge(self, other: "SessionAggregate") -> None:
+        self.started_at = min(self.started_at, other.started_at)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        ends = [e for e in (self.ended_at, other.ended_at) if e is not None]
+        self.ended_at = max(ends) if ends else None
+        self.attempts += other.attempts
+        self.correct += other.correct
+        self.spans = union_spans(self.spans + other.spans)
+        self.heartbeats += other.heartbeats
+        for topic, n in other.topics.items():
+            self.topics[topic] = self.topics.get(topic, 0) + n
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "correct": self.correct,
+            "accuracy": round(self.correct / self.attempts, 4) if self.attempts else 0.0,
+            "activeSeconds": round(self.active_seconds, 1),
+            "heartbeats": self.heartbeats,
+            "topics": dict(self.topics),
+        }
+
+    def row(self) -> dict:
+        return {
+            "session_key": self.key,
+            "user_id": self.user_id,
+            "started_at": _iso(self.started_at),
+            "ended_at": _iso(self.ended_at),
+            "stats": {**self.stats(), "spans": [[round(lo, 3), round(hi, 3)] for lo, hi in self.spans]},
+        }
+
+
+class StudySessions:
+    def __init__(self, timeout: float = STUDY_SESSION_TIMEOUT, gap_cap: float = STUDY_ACTIVE_GAP,
+                 batch_size: int = STUDY_FLUSH_BATCH):
+        self.timeout = timeout
+        self.gap_cap = gap_cap
+        self.batch_size = batch_size
+        self._open: Dict[str, SessionAggregate] = {}
+        self._pending: Dict[str, SessionAggregate] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _get(self, key: str, user_id: int, now: float) -> SessionAggregate:
+        agg = self._open.get(key)
+        if agg is None:
+            # unknown here: started on another worker or resumed after a flush
+            # (the key's MAC was checked by parse_session_id)
+            agg = self._open[key] = SessionAggregate(key, user_id, now)
+        elif agg.user_id != user_id:
+            raise SessionMismatch(key)
+        return agg
+
+    def start(self, user_id: int, now: Optional[float] = None) -> SessionAggregate:
+        now = time.time() if now is None else now
+        key = str(uuid.uuid4())
+        with self._lock:
+            agg = self._open[key] = SessionAggregate(key, user_id, now)
+        return agg
+
+    def heartbeat(self, key: str, user_id: int, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            agg = self._get(key, user_id, now)
+            agg.touch(now, self.gap_cap)
+            agg.heartbeats += 1
+            return agg.stats()
+
+    def record_attempt(self, key: str, user_id: int, is_correct: bool, topic: Optional[str], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            agg = self._get(key, user_id, now)
+            agg.touch(now, self.gap_cap)
+            agg.attempts += 1
+            agg.correct += 1 if is_correct else 0
+            if topic:
+                agg.topics[topic] = agg.topics.get(topic, 0) + 1
+
+    def end(self, key: str, user_id: int, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            agg = self._get(key, user_id, now)
+            agg.touch(now, self.gap_cap)
+            agg.ended_at = now
+            self._queue(self._open.pop(key))
+            return agg.stats()
+
+    def _queue(self, agg: SessionAggregate) -> None:
+        queued = self._pending.get(agg.key)
+        if queued is None:
+            self._pending[agg.key] = agg
+        else:
+            queued.merge(agg)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Queue sessions idle for longer than the timeout; they end at their last event."""
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [k for k, a in self._open.items() if now - a.last_seen >= self.timeout]
+            for key in idle:
+                agg = self._open.pop(key)
+                agg.ended_at = agg.last_seen
+                self._queue(agg)
+        return len(idle)
+
+    def close_all(self) -> None:
+        """Queue every open session as-is (shutdown); they stay open in the table."""
+        with self._lock:
+            for agg in self._open.values():
+                self._queue(agg)
+            self._open.clear()
+
+    def open_count(self) -> int:
+        return len(self._open)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """Expire idle sessions and write everything queued, batch_size rows per statement."""
+        self.expire(now)
+        written = 0
+        # one flusher at a time, so a failed batch is re-queued before the next one
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    keys = list(self._pending)[: self.batch_size]
+                    batch = [self._pending.pop(k) for k in keys]
+                if not batch:
+                    return written
+                try:
+                    with db.connect() as conn:
+                        with conn.cursor() as cur:
+                            write_batch(cur, batch)
+                except psycopg.Error:
+                    with self._lock:
+                        for agg in batch:
+                            self._queue(agg)
+                    raise
+                written += len(batch)
+
+
+def write_batch(cur, batch: List[SessionAggregate]) -> None:
+    cur.execute(
+        """
+        INSERT INTO study_session AS s (session_key, user_id, started_at, ended_at, stats)
+        SELECT x.session_key, x.user_id, x.started_at, x.ended_at, x.stats
+        FROM jsonb_to_recordset(%s) AS x(session_key uuid, user_id bigint, started_at timestamptz,
+                                         ended_at timestamptz, stats jsonb)
+        WHERE EXISTS (SELECT 1 FROM app_user u WHERE u.id = x.user_id)
+        ON CONFLICT (session_key) DO UPDATE
+        SET started_at = LEAST(s.started_at, EXCLUDED.started_at),
+            ended_at = GREATEST(s.ended_at, EXCLUDED.ended_at),
+            stats = merge_study_stats(s.stats, EXCLUDED.stats)
+        WHERE s.user_id = EXCLUDED.user_id
+        """,
+        (Json([agg.row() for agg in batch]),),
+    )
+
+
+class StudySessionJob:
+    def __init__(self, sessions: StudySessions, interval: float = STUDY_FLUSH_INTERVAL):
+        self.sessions = sessions
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="study-sessions")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # nothing aggregated in memory is lost on a clean shutdown
+        self.sessions.close_all()
+        try:
+            await asyncio.to_thread(self.sessions.flush)
+        except Exception:
+            logger.exception("final study session flush failed")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.sessions.flush)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("study session flush failed")
+
+
+sessions = StudySessions()
+job = StudySessionJob(sessions)
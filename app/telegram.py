@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# Shared async Telegram Bot API client: one pooled httpx.AsyncClient per bot
+# token (HTTP/2 when the `h2` extra is installed), bounded connections,
+# retries with full-jitter exponential backoff and a circuit breaker so a
+# Telegram outage fails fast instead of tying up requests. Methods that
+# deliver something (send*, forward*, copy*) are only retried when Telegram
+# provably did not act on the call: the connection was never made, or it
+# answered 429.
+
+logger = logging.getLogger("app.telegram")
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+TG_MAX_CONNECTIONS = int(os.getenv("TG_MAX_CONNECTIONS", "20") or 20)
+TG_TIMEOUT = float(os.getenv("TG_TIMEOUT", "10") or 10)
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3") or 0)
+# Longest 429 retry_after worth waiting for; a longer flood wait fails the call
+TG_MAX_RETRY_AFTER = float(os.getenv("TG_MAX_RETRY_AFTER", "5") or 0)
+
+# raised before the request left this process: nothing reached Telegram
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:  # optional: httpx[http2]
+    _HTTP2 = False
+
+
+class TelegramError(Exception):
+    pass
+
+
+class TelegramUnavailable(TelegramError):
+    """Network failure, 5xx/429 after retries, or an open circuit."""
+
+
+class TelegramAPIError(TelegramError):
+    """Bot API answered ok=false with a non-retryable error."""
+
+    def __init__(self, method: str, error_code: Optional[int], description: str):
+        super().__init__(f"{method}: {error_code} {description}")
+        self.method = method
+        self.error_code = error_code
+        self.description = description
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        # half_open lets calls through; the first result closes or re-opens it
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 2.0) -> float:
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_idempotent(method: str) -> bool:
+    """False for methods whose repetition would deliver a second message."""
+    return not method.startswith(("send", "forward", "copy"))
+
+
+class BotAPIClient:
+    def __init__(
+        self,
+        token: str,
+        base_url: str = TELEGRAM_API_BASE,
+        timeout: float = TG_TIMEOUT,
+        max_retries: int = TG_MAX_RETRIES,
+        max_retry_after: float = TG_MAX_RETRY_AFTER,
+        max_connections: int = TG_MAX_CONNECTIONS,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+        self._client = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/bot{token}/",
+            http2=_HTTP2 and transport is None,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            transport=transport,
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._client.is_closed
+
+    async def call(self, method: str, payload: Optional[dict] = None, timeout: Optional[float] = None):
+        """Call a Bot API method and return its `result`."""
+        if not self.breaker.allow():
+            raise TelegramUnavailable(f"{method}: circuit open")
+        extra = {} if timeout is None else {"timeout": timeout}
+        idempotent = is_idempotent(method)
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                res = await self._client.post(method, json=payload or {}, **extra)
+                data = res.json() if res.content else {}
+            except (httpx.TransportError, ValueError) as e:
+                error: Exception = e
+                # a read timeout or a dropped response may hide a delivered message
+                retryable = idempotent or isinstance(e, _NOT_SENT)
+            else:
+                if data.get("ok"):
+                    self.breaker.record_success()
+                    return data.get("result")
+                code = data.get("error_code") or res.status_code
+                if code != 429 and code < 500:
+                    # Client-side error: Telegram is healthy, do not trip the breaker
+                    self.breaker.record_success()
+                    raise TelegramAPIError(method, code, data.get("description") or "")
+                error = TelegramAPIError(method, code, data.get("description") or "")
+                retry_after = (data.get("parameters") or {}).get("retry_after")
+                # 429 means the call was refused; a 5xx may come after it was carried out
+                retryable = idempotent or code == 429
+                if retry_after is not None and float(retry_after) > self.max_retry_after:
+                    retryable = False
+
+            if not retryable or attempt >= self.max_retries:
+                self.breaker.record_failure()
+                raise TelegramUnavailable(f"{method}: {error}") from error
+            delay = backoff_delay(attempt) if retry_after is None else float(retry_after)
+            logger.warning("Telegram %s failed (%s), retry %d in %.2fs", method, error, attempt + 1, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# (token, base_url) -> (client, owning event loop)
+_clients: Dict[Tuple[str, str], Tuple[BotAPIClient, asyncio.AbstractEventLoop]] = {}
+
+
+def get_bot_client(token: str) -> BotAPIClient:
+    """Return the process-wide client for `token` (must be called inside the event loop)."""
+    base_url = os.getenv("TELEGRAM_API_BASE", TELEGRAM_API_BASE)
+    loop = asyncio.get_running_loop()
+    key = (token, base_url)
+    entry = _clients.get(key)
+    # A pooled AsyncClient is bound to the loop it was first used on
+    if entry is None or entry[1] is not loop or entry[0].closed:
+        entry = (BotAPIClient(token, base_url=base_url), loop)
+        _clients[key] = entry
+    return entry[0]
+
+
+async def close_bot_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client, loop in clients:
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
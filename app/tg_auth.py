@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl
+
+# Telegram Mini App initData verification.
+# The derived secret key is computed once per bot token, and successfully
+# verified init_data strings are remembered (by digest) in a bounded LRU so a
+# client re-sending the identical string on every reload skips parsing and
+# HMAC. auth_date freshness is enforced on every call, cached or not.
+
+TG_AUTH_MAX_AGE = int(os.getenv("TG_AUTH_MAX_AGE", "86400") or 0)
+TG_AUTH_CACHE_SIZE = int(os.getenv("TG_AUTH_CACHE_SIZE", "4096") or 0)
+# Tolerated clock skew for auth_date values slightly in the future
+TG_AUTH_CLOCK_SKEW = 60
+
+
+class InitDataError(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@lru_cache(maxsize=4)
+def secret_key(bot_token: str) -> bytes:
+    return hashlib.sha256(bot_token.encode()).digest()
+
+
+class _VerifiedCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[bytes, Tuple[Optional[int], Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: Tuple[Optional[int], Optional[int]]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key: bytes) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_verified = _VerifiedCache(TG_AUTH_CACHE_SIZE)
+
+
+def _check_fresh(auth_date: Optional[int], now: float) -> None:
+    if TG_AUTH_MAX_AGE <= 0:
+        return
+    if auth_date is None:
+        raise InitDataError("auth_date_missing")
+    if now - auth_date > TG_AUTH_MAX_AGE or auth_date - now > TG_AUTH_CLOCK_SKEW:
+        raise InitDataError("init_data_expired")
+
+
+def _parse_and_verify(init_data: str, bot_token: str) -> Tuple[Optional[int], Optional[int]]:
+    items = dict(parse_qsl(init_data, keep_blank_values=True))
+    recv_hash = items.pop("hash", None)
+    data_check_string = "\n".join(f"{k}={items[k]}" for k in sorted(items.keys()))
+    calc_hash = hmac.new(secret_key(bot_token), data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not (recv_hash and hmac.compare_digest(recv_hash, calc_hash)):
+        raise InitDataError("invalid_signature")
+
+    tg_user_id = None
+    user_json = items.get("user")
+    if user_json:
+        try:
+            tg_user_id = int(json.loads(user_json).get("id"))
+        except Exception:
+            tg_user_id = None
+    try:
+        auth_date = int(items["auth_date"])
+    except (KeyError, ValueError):
+        auth_date = None
+    return tg_user_id, auth_date
+
+
+def verify_init_data(init_data: str, bot_token: str, now: Optional[float] = None) -> Optional[int]:
+    """Verify signed initData and return the Telegram user id it carries (or None).
+
+    Raises InitDataError on a bad signature or a stale auth_date.
+    """
+    now = time.time() if now is None else now
+    # Bind the digest to the token so a rotated BOT_TOKEN never hits old entries
+    key = hashlib.sha256(secret_key(bot_token) + init_data.encode()).digest()
+    cached = _verified.get(key)
+    if cached is None:
+        cached = _parse_and_verify(init_data, bot_token)
+        _check_fresh(cached[1], now)
+        _verified.put(key, cached)
+        return cached[0]
+    try:
+        _check_fresh(cached[1], now)
+    except InitDataError:
+        _verified.pop(key)
+        raise
+    return cached[0]
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from app import metrics
+
+# Startup warm-up: independent steps (connection pool, content bundles,
+# caches) run concurrently in threads from the app lifespan. Startup waits at
+# most APP_WARMUP_TIMEOUT seconds; steps still running then (an unreachable
+# database) finish in the background and readiness reports them as cold.
+
+logger = logging.getLogger("app.warmup")
+
+APP_WARMUP_TIMEOUT = float(os.getenv("APP_WARMUP_TIMEOUT", "10") or 0)
+
+
+class Warmup:
+    def __init__(self, timeout: float = APP_WARMUP_TIMEOUT):
+        self.timeout = timeout
+        self.steps: Dict[str, Callable[[], object]] = {}
+        # step -> "pending" | "ok" | "error"
+        self.status: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def add(self, name: str, step: Callable[[], object]) -> None:
+        self.steps[name] = step
+
+    async def _run_step(self, name: str, step: Callable[[], object]) -> None:
+        started = time.perf_counter()
+        self.status[name] = "pending"
+        metrics.app_warmup_done.set(0, name)
+        try:
+            await asyncio.to_thread(step)
+        except Exception:
+            self.status[name] = "error"
+            logger.exception("warm-up step %s failed", name)
+        else:
+            self.status[name] = "ok"
+            metrics.app_warmup_done.set(1, name)
+        finally:
+            metrics.app_warmup_seconds.set(time.perf_counter() - started, name)
+
+    async def run(self, timeout: Optional[float] = None) -> Dict[str, str]:
+        timeout = self.timeout if timeout is None else timeout
+        self._tasks = {
+            name: asyncio.create_task(self._run_step(name, step), name=f"warmup-{name}")
+            for name, step in self.steps.items()
+        }
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks.values(), timeout=timeout or None)
+            if pending:
+                logger.warning("warm-up still running after %.1fs: %s", timeout,
+                               ", ".join(n for n, s in self.status.items() if s == "pending"))
+        return dict(self.status)
+
+    async def cancel(self) -> None:
+        # threads cannot be interrupted; this only stops waiting for them
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
@@ -0,0 +1 @@
+"""Reproducible API benchmarks: python -m bench seed|run|compare."""
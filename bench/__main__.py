@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import List, Optional
+
+# python -m bench seed     -- load the synthetic dataset (destructive, local DBs only)
+# python -m bench run      -- run scenarios, print results, optionally --save/--baseline
+# python -m bench compare  -- compare two result files
+# python -m bench prepared -- planning time saved by the prepared hot queries
+#
+# Without --url the app runs in-process over ASGI against DATABASE_URL.
+# `make bench` does all of it against the docker compose Postgres.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _dataset_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--lessons", type=int, default=300)
+    parser.add_argument("--tasks-per-lesson", type=int, default=10)
+    parser.add_argument("--attempts", type=int, default=200_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for user and lesson popularity")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def _dataset(args):
+    from bench.datagen import Dataset
+
+    return Dataset(args.users, args.lessons, args.tasks_per_lesson, args.attempts, args.skew, args.seed)
+
+
+def cmd_seed(args) -> int:
+    import psycopg
+
+    from app.db import DB_URL
+    from bench.datagen import generate, is_local
+
+    if not is_local(DB_URL) and not args.force:
+        print(f"refusing to wipe a non-local database ({DB_URL.split('@')[-1]}); pass --force", file=sys.stderr)
+        return 2
+    ds = _dataset(args)
+    with psycopg.connect(DB_URL) as conn:
+        generate(conn, ds)
+    print(f"seeded {ds.users} users, {ds.lessons} lessons, {ds.tasks} tasks, {ds.attempts} attempts")
+    return 0
+
+
+def _report(args, current: dict, baseline_path: Optional[str]) -> int:
+    from bench.compare import compare
+
+    if not baseline_path or not os.path.exists(baseline_path):
+        for name, r in current["scenarios"].items():
+            print(f"{name}: rps={r['throughput_rps']} p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+                  f"p99={r['p99_ms']}ms stmts/req={r['statements_per_request']} errors={r['errors']}")
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    lines, regressions = compare(baseline, current, args.tolerance)
+    print("\n".join(lines))
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+def cmd_run(args) -> int:
+    # the limiter would turn a benchmark into a 429 benchmark
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    from bench import runner
+    from bench.scenarios import BY_NAME, SCENARIOS
+
+    scenarios = [BY_NAME[n] for n in args.scenario] if args.scenario else SCENARIOS
+    current = asyncio.run(runner.run(
+        scenarios, _dataset(args), url=args.url, duration=args.duration, concurrency=args.concurrency,
+        warmup=args.warmup, sessions=args.sessions, bot_token=os.getenv("BOT_TOKEN") or None,
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save}")
+    return _report(args, current, None if args.save else args.baseline)
+
+
+def cmd_compare(args) -> int:
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    return _report(args, current, args.baseline)
+
+
+def cmd_prepared(args) -> int:
+    from bench import prepared
+
+    results = prepared.run(iterations=args.iterations)
+    print("\n".join(prepared.format_results(results)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from bench.scenarios import BY_NAME
+
+    parser = argparse.ArgumentParser(prog="python -m bench", description="EngTrain API benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed = sub.add_parser("seed", help="load the synthetic dataset")
+    _dataset_args(seed)
+    seed.add_argument("--force", action="store_true", help="allow a non-local DATABASE_URL")
+    seed.set_defaults(func=cmd_seed)
+
+    run = sub.add_parser("run", help="run scenarios")
+    _dataset_args(run)
+    run.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    run.add_argument("--scenario", action="append", choices=sorted(BY_NAME), help="repeatable; default all")
+    run.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    run.add_argument("--warmup", type=float, default=2.0)
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--sessions", type=int, default=200, help="users that log in via /auth/tg first")
+    run.add_argument("--output", help="write results JSON here")
+    run.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help="write results as the new baseline")
+    run.add_argument("--baseline", default=DEFAULT_BASELINE)
+    run.add_argument("--tolerance", type=float, default=0.2)
+    run.set_defaults(func=cmd_run)
+
+    cmp = sub.add_parser("compare", help="compare a results file with the baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--baseline", default=DEFAULT_BASELINE)
+    cmp.add_argument("--tolerance", type=float, default=0.2)
+    cmp.set_defaults(func=cmd_compare)
+
+    prep = sub.add_parser("prepared", help="prepared vs. unprepared hot queries on one connection")
+    prep.add_argument("--iterations", type=int, default=200)
+    prep.add_argument("--output", help="write results JSON here")
+    prep.set_defaults(func=cmd_prepared)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+from typing import List, Tuple
+
+# A run regresses against the baseline when, for any scenario present in
+# both, latency percentiles grow or throughput drops by more than the
+# tolerance, or it issues more DB statements per request at all.
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> Tuple[List[str], List[str]]:
+    """Return (report lines, regressions)."""
+    lines: List[str] = []
+    regressions: List[str] = []
+    base_scenarios = baseline.get("scenarios", {})
+    for name, cur in current.get("scenarios", {}).items():
+        base = base_scenarios.get(name)
+        if base is None:
+            lines.append(f"{name}: new scenario, no baseline")
+            continue
+        parts = []
+        for key in LATENCY_KEYS:
+            b, c = base.get(key) or 0.0, cur.get(key) or 0.0
+            parts.append(f"{key}={c:.2f} ({_delta(b, c)})")
+            if b > 0 and c > b * (1 + tolerance):
+                regressions.append(f"{name}: {key} {b:.2f} -> {c:.2f}")
+        b, c = base.get("throughput_rps") or 0.0, cur.get("throughput_rps") or 0.0
+        parts.append(f"rps={c:.1f} ({_delta(b, c)})")
+        if b > 0 and c < b * (1 - tolerance):
+            regressions.append(f"{name}: throughput {b:.1f} -> {c:.1f} rps")
+        b, c = base.get("statements_per_request"), cur.get("statements_per_request")
+        if c is not None:
+            parts.append(f"stmts/req={c:g}")
+            # statement counts are deterministic: any increase is a new query
+            if b is not None and c > b + 0.01:
+                regressions.append(f"{name}: statements/request {b:g} -> {c:g}")
+        if cur.get("errors"):
+            parts.append(f"errors={cur['errors']}")
+            if not base.get("errors"):
+                regressions.append(f"{name}: {cur['errors']} errors (baseline had none)")
+        lines.append(f"{name}: " + " ".join(parts))
+    return lines, regressions
+
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before:+.0%}"
@@ -0,0 +1,127 @@
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Sequence
+
+from psycopg.conninfo import conninfo_to_dict
+from psycopg.types.json import Jsonb
+
+# Synthetic dataset: N users, M lessons with T tasks each and K attempts.
+# Activity follows a Zipf-like skew so a few users and lessons are hot, like
+# production; popularity follows id order (id 1 is the hottest). Ids are
+# assigned densely from 1 so scenarios can address rows without reading them
+# back. Generation is deterministic for a given seed.
+
+TG_USER_BASE = 1_000_000
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "db", ""}
+
+GRAMMAR_SECTIONS = ["Tenses", "Modals", "Conditionals", "Articles", "Prepositions", "Passive Voice"]
+VOCAB_SECTIONS = ["Travel", "Work", "Food", "Health", "Technology"]
+
+
+class Dataset(NamedTuple):
+    users: int
+    lessons: int
+    tasks_per_lesson: int
+    attempts: int
+    skew: float
+    seed: int
+
+    @property
+    def tasks(self) -> int:
+        return self.lessons * self.tasks_per_lesson
+
+
+def zipf_cum_weights(n: int, skew: float) -> List[float]:
+    """Cumulative weights for ranks 1..n with weight 1/rank**skew (skew 0 = uniform)."""
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def pick(rng: random.Random, cum_weights: Sequence[float]) -> int:
+    """Zero-based index drawn from cumulative weights."""
+    return bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])
+
+
+def lesson_topic(lesson_no: int) -> str:
+    # two thirds grammar, one third vocabulary; four units per subsection
+    if lesson_no % 3 == 2:
+        section = VOCAB_SECTIONS[lesson_no % len(VOCAB_SECTIONS)]
+        return f"🧠 Vocabulary / {section} / Set {lesson_no // 15 % 3 + 1} / Unit {lesson_no % 4 + 1}"
+    section = GRAMMAR_SECTIONS[lesson_no % len(GRAMMAR_SECTIONS)]
+    return f"📚 Grammar / {section} / Part {lesson_no // 18 % 3 + 1} / Unit {lesson_no % 4 + 1}"
+
+
+def is_local(db_url: str) -> bool:
+    return conninfo_to_dict(db_url).get("host", "") in LOCAL_HOSTS
+
+
+def generate(conn, ds: Dataset) -> None:
+    """Replace all app data with the synthetic dataset. Destructive."""
+    rng = random.Random(ds.seed)
+    now = datetime.now(timezone.utc)
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE app_user, lesson RESTART IDENTITY CASCADE")
+
+        with cur.copy("COPY app_user (id, email, tg_user_id, plan) FROM STDIN") as copy:
+            for uid in range(1, ds.users + 1):
+                tg = TG_USER_BASE + uid
+                copy.write_row((uid, f"tg-{tg}@tg.local", tg, "pro" if uid % 10 == 0 else "free"))
+
+        with cur.copy("COPY lesson (id, title, topic, metadata) FROM STDIN") as copy:
+            for lid in range(1, ds.lessons + 1):
+                copy.write_row((lid, f"Lesson {lid}", lesson_topic(lid), Jsonb({"level": str(lid % 3 + 1)})))
+
+        with cur.copy("COPY task (id, lesson_id, content, answer, topic) FROM STDIN") as copy:
+            for lid in range(1, ds.lessons + 1):
+                topic = lesson_topic(lid)
+                for n in range(ds.tasks_per_lesson):
+                    tid = (lid - 1) * ds.tasks_per_lesson + n + 1
+                    content = {"type": "choice", "text": f"Question {tid}", "options": ["a", "b", "c", "d"]}
+                    copy.write_row((tid, lid, Jsonb(content), Jsonb({"correct": tid % 4}), topic))
+
+        user_weights = zipf_cum_weights(ds.users, ds.skew)
+        lesson_weights = zipf_cum_weights(ds.lessons, ds.skew)
+        # the per-row aggregate triggers would dominate the load; progress and
+        # topic stats are rebuilt in bulk below instead
+        cur.execute("ALTER TABLE task_attempt DISABLE TRIGGER USER")
+        # monthly partitions for the whole generated history
+        cur.execute(
+            """
+            SELECT create_task_attempt_partition(m::date)
+            FROM generate_series(date_trunc('month', now() - interval '90 days'), now(), interval '1 month') AS m
+            """
+        )
+        with cur.copy("COPY task_attempt (user_id, task_id, submitted_at, finished_at, is_correct, response) FROM STDIN") as copy:
+            for _ in range(ds.attempts):
+                uid = pick(rng, user_weights) + 1
+                lid = pick(rng, lesson_weights) + 1
+                tid = (lid - 1) * ds.tasks_per_lesson + rng.randrange(ds.tasks_per_lesson) + 1
+                at = now - timedelta(seconds=rng.randrange(90 * 86400))
+                copy.write_row((uid, tid, at, at, rng.random() < 0.7, Jsonb({"choice": rng.randrange(4)})))
+        cur.execute("ALTER TABLE task_attempt ENABLE TRIGGER USER")
+
+        cur.execute(
+            """
+            INSERT INTO lesson_progress (user_id, lesson_id, attempts, correct, accuracy, mastered, last_attempt_at)
+            SELECT a.user_id, t.lesson_id, COUNT(*), COUNT(*) FILTER (WHERE a.is_correct),
+                   AVG(a.is_correct::int), COUNT(*) >= 5 AND AVG(a.is_correct::int) >= 0.8, MAX(a.submitted_at)
+            FROM task_attempt a JOIN task t ON t.id = a.task_id
+            GROUP BY a.user_id, t.lesson_id
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO topic_stats (user_id, topic, attempts, correct, accuracy)
+            SELECT a.user_id, t.topic, COUNT(*), COUNT(*) FILTER (WHERE a.is_correct), AVG(a.is_correct::int)
+            FROM task_attempt a JOIN task t ON t.id = a.task_id
+            GROUP BY a.user_id, t.topic
+            """
+        )
+        for table in ("app_user", "lesson", "task", "task_attempt"):
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))")
+    conn.commit()
+    # fresh statistics, or the first scenarios measure the planner guessing
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
@@ -0,0 +1,97 @@
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+import psycopg
+
+from app import db
+
+# Planning time saved by the prepared hot queries (db.prepared). Each
+# read-only registered query runs on one connection, first with prepare=False
+# (parsed and planned on every execution, what DB_PGBOUNCER=1 does), then
+# prepared (what pooled connections do). EXPLAIN (SUMMARY ON) gives the
+# planner's share of a single execution for reference.
+#
+#   python -m bench prepared [--iterations N]
+#
+# Parameters are sampled from the database, so run it after `python -m bench seed`.
+
+LESSON_PATTERNS = ["Grammar%", "📚%", "📌%", "🧱%", "🛠%", "🚫%"]
+
+
+def sample_params(cur) -> Dict[str, Callable[[], object]]:
+    cur.execute("SELECT user_id, lesson_id FROM lesson_progress ORDER BY attempts DESC LIMIT 1")
+    row = cur.fetchone()
+    if row is None:
+        cur.execute("SELECT (SELECT id FROM app_user ORDER BY id LIMIT 1), (SELECT id FROM lesson ORDER BY id LIMIT 1)")
+        row = cur.fetchone()
+    user_id, lesson_id = row
+    cur.execute("SELECT id FROM task WHERE lesson_id = %s ORDER BY id LIMIT 1", (lesson_id,))
+    task = cur.fetchone()
+    task_id = task[0] if task else None
+    return {
+        "attempt_task": lambda: (task_id,),
+        "attempt_progress": lambda: (user_id, lesson_id),
+        "get_lessons": lambda: ([lesson_id],),
+        "next_task_user": lambda: {"user_id": user_id, "lesson_id": lesson_id},
+        "next_task_guest": lambda: (lesson_id,),
+        "progress_summary_lessons": lambda: (user_id,),
+        "progress_summary_weak": lambda: (user_id,),
+        "lessons_overview": lambda: {"user_id": user_id, "patterns": LESSON_PATTERNS, "path": None},
+        "lessons_overview_all": lambda: {"user_id": user_id},
+    }
+
+
+def planning_ms(cur, query: str, params) -> Optional[float]:
+    try:
+        cur.execute("EXPLAIN (SUMMARY ON, FORMAT JSON) " + query, params, prepare=False)
+        return float(cur.fetchone()[0][0]["Planning Time"])
+    except (psycopg.Error, KeyError, IndexError, TypeError):
+        return None
+
+
+def time_executions(cur, query: str, params, prepare: bool, iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        cur.execute(query, params, prepare=prepare)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def run(url: str = db.DB_URL, iterations: int = 200) -> Dict[str, dict]:
+    # make sure every lazily registered query (schema variants) is known
+    from app import main, schema
+
+    main._lessons_overview_queries(schema.current.lesson_topic, schema.current.lesson_subtopic)
+    results: Dict[str, dict] = {}
+    with psycopg.connect(url, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            params = sample_params(cur)
+            for name, query in sorted(db.prepared_queries.items()):
+                if name not in params:
+                    continue  # writes, or nothing to sample
+                args = params[name]()
+                plan = planning_ms(cur, query, args)
+                time_executions(cur, query, args, False, 5)
+                plain = time_executions(cur, query, args, False, iterations)
+                # the first prepared execution pays for PREPARE; leave it out
+                time_executions(cur, query, args, True, 5)
+                prepared = time_executions(cur, query, args, True, iterations)
+                results[name] = {
+                    "planning_ms": round(plan, 3) if plan is not None else None,
+                    "unprepared_ms": round(statistics.mean(plain), 3),
+                    "prepared_ms": round(statistics.mean(prepared), 3),
+                }
+    return results
+
+
+def format_results(results: Dict[str, dict]) -> List[str]:
+    lines = [f"{'query':<26} {'plan ms':>8} {'plain ms':>9} {'prepared ms':>12} {'saved':>7}"]
+    for name, r in sorted(results.items()):
+        plan = "-" if r["planning_ms"] is None else f"{r['planning_ms']:.3f}"
+        plain, prepared = r["unprepared_ms"], r["prepared_ms"]
+        saved = f"{(plain - prepared) / plain * 100:.0f}%" if plain else "-"
+        lines.append(f"{name:<26} {plan:>8} {plain:>9.3f} {prepared:>12.3f} {saved:>7}")
+    return lines
@@ -0,0 +1,160 @@
+import asyncio
+import math
+import platform
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from bench.datagen import TG_USER_BASE, Dataset
+from bench.scenarios import Context, Scenario, auth_body
+
+# Closed-loop load: `concurrency` virtual clients each send their next request
+# as soon as the previous one completes, for `duration` seconds per scenario
+# after a short warmup. DB statement counts come from the server's own
+# http_request_db_statements histogram (/metrics), so they are exact for both
+# in-process and remote targets.
+
+_METRIC_LINE = re.compile(r'^(?P<name>\w+)\{(?P<labels>[^}]*)\} (?P<value>\S+)$')
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def parse_statement_totals(text: str) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(method, route) -> (statements sum, request count) from /metrics text."""
+    sums: Dict[Tuple[str, str], float] = {}
+    counts: Dict[Tuple[str, str], float] = {}
+    for line in text.splitlines():
+        m = _METRIC_LINE.match(line)
+        if not m or not m.group("name").startswith("http_request_db_statements_"):
+            continue
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', m.group("labels")))
+        key = (labels.get("method", ""), labels.get("route", ""))
+        if m.group("name").endswith("_sum"):
+            sums[key] = float(m.group("value"))
+        elif m.group("name").endswith("_count"):
+            counts[key] = float(m.group("value"))
+    return {k: (sums.get(k, 0.0), counts.get(k, 0.0)) for k in set(sums) | set(counts)}
+
+
+@asynccontextmanager
+async def make_client(url: Optional[str], timeout: float = 30.0) -> AsyncIterator[httpx.AsyncClient]:
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+            yield client
+        return
+    from app.main import app
+
+    # ASGITransport does not send lifespan events: start the app like a server
+    # would (pool, schema snapshot, warm caches) or every request measures a
+    # fresh connection
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            yield client
+
+
+async def _statement_totals(client: httpx.AsyncClient) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    r = await client.get("/metrics")
+    r.raise_for_status()
+    return parse_statement_totals(r.text)
+
+
+async def login(client: httpx.AsyncClient, ctx: Context, users: int) -> None:
+    """Give the `users` hottest virtual users a session token via /auth/tg."""
+    for uid in range(1, min(users, ctx.ds.users) + 1):
+        r = await client.post("/auth/tg", json=auth_body(TG_USER_BASE + uid, ctx.bot_token))
+        r.raise_for_status()
+        body = r.json()
+        if body.get("userId") != uid:
+            raise RuntimeError(f"/auth/tg mapped tg user {TG_USER_BASE + uid} to {body.get('userId')}; seed the bench dataset first")
+        ctx.tokens[uid] = body["sessionToken"]
+
+
+async def _drive(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, until: float, latencies: Optional[List[float]], errors: Dict[int, int]) -> None:
+    while time.perf_counter() < until:
+        method, path, kwargs = scenario.build(ctx)
+        started = time.perf_counter()
+        try:
+            r = await client.request(method, path, **kwargs)
+            status = r.status_code
+        except httpx.HTTPError:
+            status = 0
+        elapsed = time.perf_counter() - started
+        if latencies is None:
+            continue
+        if status >= 400 or status == 0:
+            errors[status] = errors.get(status, 0) + 1
+        else:
+            latencies.append(elapsed)
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, duration: float, concurrency: int, warmup: float) -> dict:
+    if warmup > 0:
+        until = time.perf_counter() + warmup
+        await asyncio.gather(*(_drive(client, scenario, ctx, until, None, {}) for _ in range(concurrency)))
+
+    before = await _statement_totals(client)
+    latencies: List[float] = []
+    errors: Dict[int, int] = {}
+    started = time.perf_counter()
+    until = started + duration
+    await asyncio.gather(*(_drive(client, scenario, ctx, until, latencies, errors) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    after = await _statement_totals(client)
+
+    key = (scenario.method, scenario.route)
+    stmts, reqs = after.get(key, (0.0, 0.0))
+    stmts0, reqs0 = before.get(key, (0.0, 0.0))
+    served = reqs - reqs0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_statuses": {str(k): v for k, v in sorted(errors.items())},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "statements_per_request": round((stmts - stmts0) / served, 3) if served else None,
+    }
+
+
+async def run(
+    scenarios: Sequence[Scenario],
+    ds: Dataset,
+    url: Optional[str] = None,
+    duration: float = 10.0,
+    concurrency: int = 16,
+    warmup: float = 2.0,
+    sessions: int = 200,
+    bot_token: Optional[str] = None,
+) -> dict:
+    ctx = Context(ds, seed=ds.seed, bot_token=bot_token)
+    results = {}
+    async with make_client(url) as client:
+        if sessions:
+            await login(client, ctx, sessions)
+        for scenario in scenarios:
+            results[scenario.name] = await run_scenario(client, scenario, ctx, duration, concurrency, warmup)
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "target": url or "in-process",
+            "python": platform.python_version(),
+            "duration": duration,
+            "concurrency": concurrency,
+            "sessions": sessions,
+            "dataset": ds._asdict(),
+        },
+        "scenarios": results,
+    }
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from app.tg_auth import secret_key
+from bench.datagen import TG_USER_BASE, Dataset, pick, zipf_cum_weights
+
+# Scripted request mixes, one per endpoint. Each scenario builds requests for
+# a virtual user drawn with the same skew as the generated data.
+
+
+class Context:
+    def __init__(self, ds: Dataset, seed: int = 0, bot_token: Optional[str] = None):
+        self.ds = ds
+        self.bot_token = bot_token
+        self.rng = random.Random(seed)
+        self.user_weights = zipf_cum_weights(ds.users, ds.skew)
+        self.lesson_weights = zipf_cum_weights(ds.lessons, ds.skew)
+        self.tokens: Dict[int, str] = {}
+
+    def user(self) -> int:
+        return pick(self.rng, self.user_weights) + 1
+
+    def lesson(self) -> int:
+        return pick(self.rng, self.lesson_weights) + 1
+
+    def task(self, lesson_id: int) -> int:
+        return (lesson_id - 1) * self.ds.tasks_per_lesson + self.rng.randrange(self.ds.tasks_per_lesson) + 1
+
+    def auth(self, uid: int) -> Dict[str, str]:
+        token = self.tokens.get(uid)
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    def user_params(self, uid: int) -> Dict[str, int]:
+        # without a session the legacy user_id parameter identifies the caller
+        return {} if uid in self.tokens else {"user_id": uid}
+
+
+Request = Tuple[str, str, dict]  # method, path, httpx request kwargs
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    route: str  # route template, as labelled in /metrics
+    build: Callable[[Context], Request]
+
+
+def _attempt(ctx: Context) -> Request:
+    uid = ctx.user()
+    task_id = ctx.task(ctx.lesson())
+    body = {"task_id": task_id, "is_correct": ctx.rng.random() < 0.7, "response": {"choice": ctx.rng.randrange(4)}}
+    if uid not in ctx.tokens:
+        body["user_id"] = uid
+    return "POST", "/attempts", {"json": body, "headers": ctx.auth(uid)}
+
+
+def _tasks_next(ctx: Context) -> Request:
+    uid = ctx.user()
+    params = {"lesson_id": ctx.lesson(), **ctx.user_params(uid)}
+    return "GET", "/tasks/next", {"params": params, "headers": ctx.auth(uid)}
+
+
+def _lessons_overview(ctx: Context) -> Request:
+    uid = ctx.user()
+    group = "vocabulary" if ctx.rng.random() < 0.3 else "grammar"
+    return "GET", "/lessons/overview", {"params": {"group": group, **ctx.user_params(uid)}, "headers": ctx.auth(uid)}
+
+
+def _catalog_tree(ctx: Context) -> Request:
+    group = "vocabulary" if ctx.rng.random() < 0.3 else "grammar"
+    return "GET", "/catalog/tree", {"params": {"group": group}}
+
+
+def _progress_summary(ctx: Context) -> Request:
+    uid = ctx.user()
+    return "GET", "/progress/summary", {"params": ctx.user_params(uid), "headers": ctx.auth(uid)}
+
+
+def _auth_tg(ctx: Context) -> Request:
+    return "POST", "/auth/tg", {"json": auth_body(TG_USER_BASE + ctx.user(), ctx.bot_token)}
+
+
+def sign_init_data(tg_user_id: int, bot_token: str) -> str:
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": tg_user_id})}
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    fields["hash"] = hmac.new(secret_key(bot_token), check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def auth_body(tg_user_id: int, bot_token: Optional[str] = None) -> dict:
+    # with BOT_TOKEN set the server only trusts signed initData
+    if not bot_token:
+        return {"tg_user_id": tg_user_id}
+    return {"init_data": sign_init_data(tg_user_id, bot_token)}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("attempts", "POST", "/attempts", _attempt),
+    Scenario("tasks_next", "GET", "/tasks/next", _tasks_next),
+    Scenario("lessons_overview", "GET", "/lessons/overview", _lessons_overview),
+    Scenario("catalog_tree", "GET", "/catalog/tree", _catalog_tree),
+    Scenario("progress_summary", "GET", "/progress/summary", _progress_summary),
+    Scenario("auth_tg", "POST", "/auth/tg", _auth_tg),
+]
+BY_NAME = {s.name: s for s in SCENARIOS}
@@ -0,0 +1,44 @@
+"""telegram update inbox for asynchronous webhook processing
+
+Revision ID: 0006_tg_update_inbox
+Revises: 0005_merge_heads
+Create Date: 2025-09-01 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0006_tg_update_inbox"
+down_revision = "0005_merge_heads"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # update_id is the dedup key: Telegram retries deliver the same update_id
+    op.create_table(
+        "telegram_update_inbox",
+        sa.Column("update_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("received_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("processed_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+
+    # Workers only ever scan the pending tail
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_tg_inbox_pending
+        ON telegram_update_inbox (update_id) WHERE processed_at IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tg_inbox_pending")
+    op.drop_table("telegram_update_inbox")
@@ -0,0 +1,74 @@
+"""append-only payment_event ledger and pro expiry index
+
+Revision ID: 0007_payment_event
+Revises: 0006_tg_update_inbox
+Create Date: 2025-09-02 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0007_payment_event"
+down_revision = "0006_tg_update_inbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Every plan change (payment, admin action) is appended here; app_user.plan /
+    # pro_until become a projection recomputed from the latest event per user.
+    op.create_table(
+        "payment_event",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("app_user.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("plan", sa.String(length=16), nullable=False),
+        sa.Column("pro_until", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("source_ref", sa.Text(), nullable=True),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("applied_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index("ix_payment_event_user", "payment_event", ["user_id", "id"])
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_payment_event_source_ref
+        ON payment_event (source_ref) WHERE source_ref IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_payment_event_unapplied
+        ON payment_event (user_id) WHERE applied_at IS NULL
+        """
+    )
+
+    # Expiry sweep scans only pro users ordered by expiry
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_app_user_pro_until
+        ON app_user (pro_until) WHERE plan = 'pro'
+        """
+    )
+
+    # Seed the ledger with the current state so history starts from here
+    op.execute(
+        """
+        INSERT INTO payment_event (user_id, kind, plan, pro_until, applied_at)
+        SELECT id, 'migration', plan, pro_until, now()
+        FROM app_user
+        WHERE plan <> 'free' OR pro_until IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_app_user_pro_until")
+    op.execute("DROP INDEX IF EXISTS ix_payment_event_unapplied")
+    op.execute("DROP INDEX IF EXISTS ux_payment_event_source_ref")
+    op.drop_index("ix_payment_event_user", table_name="payment_event")
+    op.drop_table("payment_event")
@@ -0,0 +1,34 @@
+"""precomputed daily challenge sets
+
+Revision ID: 0008_daily_challenge
+Revises: 0007_payment_event
+Create Date: 2025-09-03 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0008_daily_challenge"
+down_revision = "0007_payment_event"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One immutable challenge set per (day, level); the first generator wins
+    op.create_table(
+        "daily_challenge",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("level", sa.SmallInteger(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("generated_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("day", "level", name="pk_daily_challenge"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_challenge")
@@ -0,0 +1,45 @@
+"""unlogged rate limit state for the shared limiter backend
+
+Revision ID: 0009_rate_limit
+Revises: 0008_daily_challenge
+Create Date: 2025-09-04 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0009_rate_limit"
+down_revision = "0008_daily_challenge"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: no WAL per request; the state is disposable after a crash
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_bucket (
+            key text PRIMARY KEY,
+            tokens double precision NOT NULL,
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            allowed boolean NOT NULL DEFAULT true
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_daily (
+            key text NOT NULL,
+            day date NOT NULL,
+            used integer NOT NULL DEFAULT 0,
+            PRIMARY KEY (key, day)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS rate_limit_daily")
+    op.execute("DROP TABLE IF EXISTS rate_limit_bucket")
@@ -0,0 +1,284 @@
+"""monthly range partitions for task_attempt, daily rollups for aged data
+
+Revision ID: 0010_attempt_partitions
+Revises: 0009_rate_limit
+Create Date: 2025-09-06 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0010_attempt_partitions"
+down_revision = "0009_rate_limit"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Move the existing table aside; the id sequence is handed over below
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_task_attempt_after_insert ON task_attempt;
+        ALTER TABLE task_attempt RENAME TO task_attempt_legacy;
+        ALTER INDEX IF EXISTS task_attempt_pkey RENAME TO task_attempt_legacy_pkey;
+        DROP INDEX IF EXISTS idx_attempt_user_time;
+        DROP INDEX IF EXISTS idx_attempt_error_tags_gin;
+        """
+    )
+
+    # The partition key must be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE task_attempt (
+            id bigint NOT NULL DEFAULT nextval('task_attempt_id_seq'),
+            user_id bigint NOT NULL REFERENCES app_user(id) ON DELETE CASCADE,
+            task_id bigint NOT NULL REFERENCES task(id) ON DELETE CASCADE,
+            submitted_at timestamptz NOT NULL DEFAULT now(),
+            finished_at timestamptz,
+            is_correct boolean NOT NULL DEFAULT false,
+            response jsonb,
+            error_tags jsonb,
+            PRIMARY KEY (id, submitted_at)
+        ) PARTITION BY RANGE (submitted_at);
+
+        ALTER TABLE task_attempt_legacy ALTER COLUMN id DROP DEFAULT;
+        ALTER SEQUENCE task_attempt_id_seq OWNED BY task_attempt.id;
+
+        -- idx_attempt_user_time (finished_at, never read) and the GIN index on
+        -- error_tags (the main insert cost) are not carried over.
+        -- next_task counts per (user, task); mastery reads a user's latest attempts
+        CREATE INDEX ix_task_attempt_user_task ON task_attempt (user_id, task_id);
+        CREATE INDEX ix_task_attempt_user_submitted ON task_attempt (user_id, submitted_at DESC);
+
+        -- catches rows outside every monthly partition until their month is created
+        CREATE TABLE task_attempt_default PARTITION OF task_attempt DEFAULT;
+        """
+    )
+
+    # Monthly partitions are named task_attempt_pYYYYMM and bounded in UTC.
+    # Rows that already landed in the default partition move into the new one.
+    op.execute(
+        r"""
+        CREATE OR REPLACE FUNCTION create_task_attempt_partition(p_month date)
+        RETURNS text LANGUAGE plpgsql AS $$
+        DECLARE
+            v_start date := date_trunc('month', p_month)::date;
+            v_lo timestamptz := v_start::timestamp AT TIME ZONE 'UTC';
+            v_hi timestamptz := (v_start + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+            v_name text := 'task_attempt_p' || to_char(v_start, 'YYYYMM');
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('task_attempt_partitions'));
+            IF to_regclass(v_name) IS NOT NULL THEN
+                RETURN v_name;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE task_attempt INCLUDING DEFAULTS)', v_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM task_attempt_default WHERE submitted_at >= %L AND submitted_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                v_lo, v_hi, v_name
+            );
+            EXECUTE format('ALTER TABLE task_attempt ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', v_name, v_lo, v_hi);
+            RETURN v_name;
+        END;
+        $$;
+        """
+    )
+
+    # Aged partitions are folded into these before they are detached
+    op.execute(
+        """
+        CREATE TABLE task_attempt_daily (
+            user_id bigint NOT NULL REFERENCES app_user(id) ON DELETE CASCADE,
+            task_id bigint NOT NULL REFERENCES task(id) ON DELETE CASCADE,
+            day date NOT NULL,
+            attempts integer NOT NULL,
+            correct integer NOT NULL,
+            PRIMARY KEY (user_id, task_id, day)
+        );
+        """
+    )
+
+    # Partitions for every month with data, plus the next two
+    op.execute(
+        """
+        SELECT create_task_attempt_partition(m::date)
+        FROM generate_series(
+            date_trunc('month', LEAST(
+                COALESCE((SELECT MIN(submitted_at) FROM task_attempt_legacy), now()), now()
+            ) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months',
+            interval '1 month'
+        ) AS m;
+
+        INSERT INTO task_attempt (id, user_id, task_id, submitted_at, finished_at, is_correct, response, error_tags)
+        SELECT id, user_id, task_id, submitted_at, finished_at, is_correct, response, error_tags
+        FROM task_attempt_legacy;
+
+        DROP TABLE task_attempt_legacy;
+        """
+    )
+
+    # The 0002 aggregation functions look the attempt up by id alone, which on
+    # a partitioned table probes every partition three times per insert. These
+    # overloads take the NEW row's fields instead; the only attempt read left,
+    # the mastery streak, is bounded by submitted_at so older months are pruned.
+    # The p_attempt_id versions stay for the downgrade.
+    op.execute(
+        r"""
+        CREATE OR REPLACE FUNCTION update_lesson_progress_on_attempt(p_user_id bigint, p_lesson_id bigint, p_is_correct boolean)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO lesson_progress (user_id, lesson_id, attempts, correct, accuracy, mastered, last_attempt_at)
+            VALUES (p_user_id, p_lesson_id, 1, CASE WHEN p_is_correct THEN 1 ELSE 0 END, CASE WHEN p_is_correct THEN 1 ELSE 0 END, FALSE, now())
+            ON CONFLICT (user_id, lesson_id)
+            DO UPDATE SET
+                attempts = lesson_progress.attempts + 1,
+                correct = lesson_progress.correct + CASE WHEN p_is_correct THEN 1 ELSE 0 END,
+                accuracy = (lesson_progress.correct + CASE WHEN p_is_correct THEN 1 ELSE 0 END)::float / (lesson_progress.attempts + 1),
+                last_attempt_at = now();
+        END;
+        $$;
+
+        CREATE OR REPLACE FUNCTION update_topic_stats_on_attempt(p_user_id bigint, p_topic text, p_is_correct boolean)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO topic_stats (user_id, topic, attempts, correct, accuracy)
+            VALUES (p_user_id, p_topic, 1, CASE WHEN p_is_correct THEN 1 ELSE 0 END, CASE WHEN p_is_correct THEN 1 ELSE 0 END)
+            ON CONFLICT (user_id, topic)
+            DO UPDATE SET
+                attempts = topic_stats.attempts + 1,
+                correct = topic_stats.correct + CASE WHEN p_is_correct THEN 1 ELSE 0 END,
+                accuracy = (topic_stats.correct + CASE WHEN p_is_correct THEN 1 ELSE 0 END)::float / (topic_stats.attempts + 1);
+        END;
+        $$;
+
+        CREATE OR REPLACE FUNCTION recompute_mastered_on_attempt(p_user_id bigint, p_lesson_id bigint, p_submitted_at timestamptz)
+        RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            v_attempts int;
+            v_accuracy float;
+            v_recent int;
+            v_last_three_correct int;
+        BEGIN
+            SELECT attempts, accuracy
+            INTO v_attempts, v_accuracy
+            FROM lesson_progress
+            WHERE user_id = p_user_id AND lesson_id = p_lesson_id;
+
+            -- the latest three attempts almost always fall in the last month
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE s.is_correct)
+            INTO v_recent, v_last_three_correct
+            FROM (
+                SELECT ta.is_correct
+                FROM task_attempt ta
+                JOIN task t ON t.id = ta.task_id
+                WHERE ta.user_id = p_user_id AND t.lesson_id = p_lesson_id
+                  AND ta.submitted_at >= p_submitted_at - interval '31 days'
+                ORDER BY ta.submitted_at DESC
+                LIMIT 3
+            ) s;
+
+            IF v_recent < 3 THEN
+                SELECT COUNT(*)
+                INTO v_last_three_correct
+                FROM (
+                    SELECT ta.is_correct
+                    FROM task_attempt ta
+                    JOIN task t ON t.id = ta.task_id
+                    WHERE ta.user_id = p_user_id AND t.lesson_id = p_lesson_id
+                    ORDER BY ta.submitted_at DESC
+                    LIMIT 3
+                ) s
+                WHERE s.is_correct = TRUE;
+            END IF;
+
+            IF v_last_three_correct = 3 OR (v_attempts >= 10 AND v_accuracy >= 0.9) THEN
+                UPDATE lesson_progress
+                SET mastered = TRUE
+                WHERE user_id = p_user_id AND lesson_id = p_lesson_id;
+            END IF;
+        END;
+        $$;
+
+        CREATE OR REPLACE FUNCTION apply_all_aggregations_on_attempt()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            v_lesson_id bigint;
+            v_topic text;
+        BEGIN
+            SELECT t.lesson_id, COALESCE(l.topic, 'unknown')
+            INTO v_lesson_id, v_topic
+            FROM task t
+            LEFT JOIN lesson l ON l.id = t.lesson_id
+            WHERE t.id = NEW.task_id;
+
+            PERFORM update_lesson_progress_on_attempt(NEW.user_id, v_lesson_id, NEW.is_correct);
+            PERFORM update_topic_stats_on_attempt(NEW.user_id, v_topic, NEW.is_correct);
+            PERFORM recompute_mastered_on_attempt(NEW.user_id, v_lesson_id, NEW.submitted_at);
+            RETURN NEW;
+        END;
+        $$;
+        """
+    )
+
+    # Row triggers on a partitioned table are cloned onto every partition
+    op.execute(
+        """
+        CREATE TRIGGER trg_task_attempt_after_insert
+        AFTER INSERT ON task_attempt
+        FOR EACH ROW
+        EXECUTE FUNCTION apply_all_aggregations_on_attempt();
+        """
+    )
+
+
+def downgrade() -> None:
+    # Rolled-up history (task_attempt_daily) cannot be expanded back into rows
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_task_attempt_after_insert ON task_attempt;
+        CREATE TABLE task_attempt_flat (
+            id bigint PRIMARY KEY,
+            user_id bigint NOT NULL REFERENCES app_user(id) ON DELETE CASCADE,
+            task_id bigint NOT NULL REFERENCES task(id) ON DELETE CASCADE,
+            submitted_at timestamptz NOT NULL DEFAULT now(),
+            finished_at timestamptz,
+            is_correct boolean NOT NULL DEFAULT false,
+            response jsonb,
+            error_tags jsonb
+        );
+        INSERT INTO task_attempt_flat SELECT id, user_id, task_id, submitted_at, finished_at, is_correct, response, error_tags FROM task_attempt;
+        ALTER SEQUENCE task_attempt_id_seq OWNED BY task_attempt_flat.id;
+        ALTER TABLE task_attempt_flat ALTER COLUMN id SET DEFAULT nextval('task_attempt_id_seq');
+        DROP TABLE task_attempt;
+        ALTER TABLE task_attempt_flat RENAME TO task_attempt;
+        ALTER INDEX task_attempt_flat_pkey RENAME TO task_attempt_pkey;
+        CREATE INDEX idx_attempt_user_time ON task_attempt (user_id, finished_at DESC);
+        CREATE INDEX idx_attempt_error_tags_gin ON task_attempt USING GIN (error_tags);
+        CREATE TRIGGER trg_task_attempt_after_insert
+        AFTER INSERT ON task_attempt
+        FOR EACH ROW
+        EXECUTE FUNCTION apply_all_aggregations_on_attempt();
+        DROP TABLE task_attempt_daily;
+        DROP FUNCTION IF EXISTS create_task_attempt_partition(date);
+        """
+    )
+    op.execute(
+        r"""
+        CREATE OR REPLACE FUNCTION apply_all_aggregations_on_attempt()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM update_lesson_progress_on_attempt(NEW.id);
+            PERFORM update_topic_stats_on_attempt(NEW.id);
+            PERFORM recompute_mastered_on_attempt(NEW.id);
+            RETURN NEW;
+        END;
+        $$;
+
+        DROP FUNCTION IF EXISTS recompute_mastered_on_attempt(bigint, bigint, timestamptz);
+        DROP FUNCTION IF EXISTS update_topic_stats_on_attempt(bigint, text, boolean);
+        DROP FUNCTION IF EXISTS update_lesson_progress_on_attempt(bigint, bigint, boolean);
+        """
+    )
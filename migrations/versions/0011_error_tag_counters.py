@@ -0,0 +1,92 @@
+"""error tag dictionary, attempt score and per-user rolling mistake counters
+
+Revision ID: 0011_error_tags
+Revises: 0010_attempt_partitions
+Create Date: 2025-09-08 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0011_error_tags"
+down_revision = "0010_attempt_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE error_tag (
+            id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            tag text NOT NULL UNIQUE,
+            -- who introduced the tag: new tags are capped per user and day
+            created_by bigint REFERENCES app_user(id) ON DELETE SET NULL,
+            created_at timestamptz NOT NULL DEFAULT now()
+        );
+        CREATE INDEX idx_error_tag_created_by ON error_tag (created_by, created_at);
+
+        -- error_tags jsonb never received data; the GIN index only slowed inserts
+        DROP INDEX IF EXISTS idx_attempt_error_tags_gin;
+        ALTER TABLE task_attempt DROP COLUMN IF EXISTS error_tags;
+        ALTER TABLE task_attempt ADD COLUMN score real;
+        ALTER TABLE task_attempt ADD COLUMN error_tag_ids integer[];
+
+        CREATE TABLE user_error_tag_stats (
+            user_id bigint NOT NULL REFERENCES app_user(id) ON DELETE CASCADE,
+            tag_id integer NOT NULL REFERENCES error_tag(id) ON DELETE CASCADE,
+            occurrences integer NOT NULL DEFAULT 0,
+            weight double precision NOT NULL DEFAULT 0,
+            last_seen_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (user_id, tag_id)
+        );
+        """
+    )
+
+    # Rolling counter: weight halves every 14 days without activity, so the
+    # ranking follows recent mistakes without rescanning attempts
+    op.execute(
+        r"""
+        CREATE OR REPLACE FUNCTION decayed_error_weight(p_weight double precision, p_at timestamptz)
+        RETURNS double precision LANGUAGE sql STABLE AS $$
+            SELECT p_weight * power(0.5, GREATEST(EXTRACT(EPOCH FROM now() - p_at), 0) / (14 * 86400.0))
+        $$;
+
+        CREATE OR REPLACE FUNCTION count_attempt_error_tags()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO user_error_tag_stats AS s (user_id, tag_id, occurrences, weight, last_seen_at)
+            SELECT DISTINCT NEW.user_id, t, 1, 1.0, now()
+            FROM unnest(NEW.error_tag_ids) AS t
+            ON CONFLICT (user_id, tag_id) DO UPDATE
+            SET occurrences = s.occurrences + 1,
+                weight = decayed_error_weight(s.weight, s.last_seen_at) + 1.0,
+                last_seen_at = now();
+            RETURN NULL;
+        END;
+        $$;
+
+        CREATE TRIGGER trg_task_attempt_error_tags
+        AFTER INSERT ON task_attempt
+        FOR EACH ROW
+        WHEN (cardinality(NEW.error_tag_ids) > 0)
+        EXECUTE FUNCTION count_attempt_error_tags();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_task_attempt_error_tags ON task_attempt;
+        DROP FUNCTION IF EXISTS count_attempt_error_tags();
+        DROP FUNCTION IF EXISTS decayed_error_weight(double precision, timestamptz);
+        DROP TABLE IF EXISTS user_error_tag_stats;
+        ALTER TABLE task_attempt DROP COLUMN IF EXISTS error_tag_ids;
+        ALTER TABLE task_attempt DROP COLUMN IF EXISTS score;
+        ALTER TABLE task_attempt ADD COLUMN error_tags jsonb;
+        DROP TABLE IF EXISTS error_tag;
+        """
+    )
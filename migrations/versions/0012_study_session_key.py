@@ -0,0 +1,101 @@
+"""client-visible study session keys and mergeable session stats
+
+Revision ID: 0012_study_session_key
+Revises: 0011_error_tags
+Create Date: 2025-09-10 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0012_study_session_key"
+down_revision = "0011_error_tags"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Sessions are aggregated in memory and upserted by key in batches
+    op.execute(
+        """
+        ALTER TABLE study_session ADD COLUMN session_key uuid;
+        CREATE UNIQUE INDEX ux_study_session_key ON study_session (session_key);
+        CREATE INDEX ix_study_session_user_started ON study_session (user_id, started_at DESC);
+        """
+    )
+
+    # Partial aggregates of one session (several workers, or a flush followed
+    # by a resume) add up; accuracy is recomputed from the merged counters.
+    # Time on task is the union of both sides' spans, so minutes seen by two
+    # workers count once; rows without spans fall back to adding activeSeconds
+    op.execute(
+        r"""
+        CREATE OR REPLACE FUNCTION union_study_spans(p_spans jsonb)
+        RETURNS jsonb LANGUAGE sql IMMUTABLE AS $$
+            WITH s AS (
+                SELECT (x->>0)::float8 AS lo, (x->>1)::float8 AS hi
+                FROM jsonb_array_elements(p_spans) AS x
+            ),
+            o AS (
+                SELECT lo, hi,
+                       max(hi) OVER (ORDER BY lo, hi ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS reach
+                FROM s
+            ),
+            g AS (
+                SELECT lo, hi, count(*) FILTER (WHERE reach IS NULL OR lo > reach) OVER (ORDER BY lo, hi) AS grp
+                FROM o
+            )
+            SELECT COALESCE(jsonb_agg(jsonb_build_array(lo, hi) ORDER BY lo), '[]'::jsonb)
+            FROM (SELECT min(lo) AS lo, max(hi) AS hi FROM g GROUP BY grp) m
+        $$;
+
+        CREATE OR REPLACE FUNCTION merge_study_stats(a jsonb, b jsonb)
+        RETURNS jsonb LANGUAGE sql IMMUTABLE AS $$
+            WITH m AS (
+                SELECT COALESCE((a->>'attempts')::int, 0) + COALESCE((b->>'attempts')::int, 0) AS attempts,
+                       COALESCE((a->>'correct')::int, 0) + COALESCE((b->>'correct')::int, 0) AS correct,
+                       COALESCE((a->>'heartbeats')::int, 0) + COALESCE((b->>'heartbeats')::int, 0) AS heartbeats,
+                       union_study_spans(COALESCE(a->'spans', '[]'::jsonb) || COALESCE(b->'spans', '[]'::jsonb)) AS spans,
+                       CASE WHEN a ? 'spans' THEN 0 ELSE COALESCE((a->>'activeSeconds')::float, 0) END
+                       + CASE WHEN b ? 'spans' THEN 0 ELSE COALESCE((b->>'activeSeconds')::float, 0) END AS unspanned
+            )
+            SELECT jsonb_build_object(
+                'attempts', m.attempts,
+                'correct', m.correct,
+                'accuracy', CASE WHEN m.attempts > 0 THEN round(m.correct::numeric / m.attempts, 4) ELSE 0 END,
+                'activeSeconds', round((m.unspanned + (
+                    SELECT COALESCE(sum((x->>1)::float8 - (x->>0)::float8), 0) FROM jsonb_array_elements(m.spans) AS x
+                ))::numeric, 1),
+                'heartbeats', m.heartbeats,
+                'spans', m.spans,
+                'topics', (
+                    SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb)
+                    FROM (
+                        SELECT k, SUM(v::int) AS n
+                        FROM (
+                            SELECT * FROM jsonb_each_text(COALESCE(a->'topics', '{}'::jsonb))
+                            UNION ALL
+                            SELECT * FROM jsonb_each_text(COALESCE(b->'topics', '{}'::jsonb))
+                        ) t(k, v)
+                        GROUP BY k
+                    ) s
+                )
+            )
+            FROM m
+        $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DROP FUNCTION IF EXISTS merge_study_stats(jsonb, jsonb);
+        DROP FUNCTION IF EXISTS union_study_spans(jsonb);
+        DROP INDEX IF EXISTS ix_study_session_user_started;
+        DROP INDEX IF EXISTS ux_study_session_key;
+        ALTER TABLE study_session DROP COLUMN IF EXISTS session_key;
+        """
+    )
@@ -0,0 +1,25 @@
+"""per-update retry backoff for the Telegram inbox
+
+Revision ID: 0013_inbox_retry_backoff
+Revises: 0012_study_session_key
+Create Date: 2025-09-12 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0013_inbox_retry_backoff"
+down_revision = "0012_study_session_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A failed update is not picked up again before next_attempt_at
+    op.execute("ALTER TABLE telegram_update_inbox ADD COLUMN next_attempt_at timestamptz")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE telegram_update_inbox DROP COLUMN IF EXISTS next_attempt_at")
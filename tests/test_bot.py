@@ -0,0 +1,120 @@
+import asyncio
+import random
+from datetime import date
+
+from app import bot as bot_module
+from app.bot import Bot, Dispatcher, poll_updates
+from app.content import exercise_bank
+from app.telegram import BotAPIClient
+
+TOKEN = "42:BOT"
+
+
+def test_dispatcher_keeps_per_chat_order_with_bounded_concurrency():
+    seen = {}
+    active = 0
+    peak = 0
+
+    async def handler(update):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(random.random() / 1000)
+        seen.setdefault(update["message"]["chat"]["id"], []).append(update["update_id"])
+        active -= 1
+
+    async def _run():
+        dispatcher = Dispatcher(handler, shards=4, queue_size=8)
+        dispatcher.start()
+        update_id = 0
+        for _ in range(50):
+            for chat_id in range(10):
+                update_id += 1
+                await dispatcher.submit({"update_id": update_id, "message": {"chat": {"id": chat_id}}})
+        await dispatcher.join()
+        await dispatcher.stop()
+        return dispatcher
+
+    dispatcher = asyncio.run(_run())
+    assert dispatcher.handled == 500
+    assert peak <= 4
+    for ids in seen.values():
+        assert len(ids) == 50 and ids == sorted(ids)
+
+
+def test_bot_serves_drills_over_long_polling(fake_bot_api):
+    drill = exercise_bank()[0]
+    updates = [
+        {"update_id": 1, "message": {"chat": {"id": 7}, "text": "/start"}},
+        {"update_id": 2, "message": {"chat": {"id": 7}, "text": "/drill present"}},
+        {"update_id": 3, "callback_query": {
+            "id": "cb1", "from": {"id": 7}, "message": {"chat": {"id": 7}},
+            "data": f"ans:{drill['id']}:{drill['correct']}",
+        }},
+        {"update_id": 4, "pre_checkout_query": {"id": "pc1", "from": {"id": 7}}},
+    ]
+    batches = [updates]
+    fake_bot_api.methods["getUpdates"] = lambda body: batches.pop(0) if batches else []
+    fake_bot_api.methods["sendMessage"] = lambda body: {"message_id": 1}
+
+    async def _run():
+        client = BotAPIClient(TOKEN, base_url=fake_bot_api.base_url)
+        b = Bot(client)
+        dispatcher = Dispatcher(b.handle, shards=2)
+        dispatcher.start()
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_updates(client, dispatcher, stop, timeout=0))
+        while dispatcher.handled < len(updates):
+            await asyncio.sleep(0.01)
+        stop.set()
+        await poller
+        await dispatcher.stop()
+        await client.aclose()
+
+    asyncio.run(asyncio.wait_for(_run(), timeout=10))
+
+    polls = fake_bot_api.calls_to("getUpdates")
+    assert polls[1]["offset"] == 5  # acknowledged everything received
+    sent = fake_bot_api.calls_to("sendMessage")
+    assert [m["chat_id"] for m in sent] == [7, 7, 7]
+    assert sent[0]["text"].startswith("Hi!")
+    assert "inline_keyboard" in sent[1]["reply_markup"]
+    assert sent[2]["text"] == "✅ Correct!"
+    assert fake_bot_api.calls_to("answerCallbackQuery") == [{"callback_query_id": "cb1"}]
+    assert fake_bot_api.calls_to("answerPreCheckoutQuery") == [{"pre_checkout_query_id": "pc1", "ok": True}]
+
+
+def test_daily_drills_come_from_the_stored_challenge(monkeypatch):
+    drill = exercise_bank()[0]
+    challenge = {"day": "2025-09-01", "level": 2, "items": [
+        {"kind": "drill", "drill_id": drill["id"], "topic": drill["topic"], "text": drill["text"],
+         "options": drill["options"], "correct": drill["correct"]},
+        {"kind": "task", "task_id": 11, "lesson_id": 1, "topic": "t",
+         "prompt": {"text": "Choose", "options": ["He go", "He goes"]}, "answer_schema": {"index": 1}},
+        {"kind": "task", "task_id": 12, "lesson_id": 1, "topic": "t",
+         "prompt": {"text": "He go to school."}, "answer_schema": {"is_correct": False}},
+    ]}
+    requested = []
+    monkeypatch.setattr(bot_module, "today", lambda: date(2025, 9, 1))
+    monkeypatch.setattr(bot_module.daily_challenges, "get", lambda day, level: requested.append((day, level)) or challenge)
+    drills = bot_module.daily_drills(2)
+    assert requested == [(date(2025, 9, 1), 2)]
+    assert [d["id"] for d in drills] == [drill["id"], "task-11", "task-12"]
+    assert drills[0]["correct"] == drill["correct"]
+    assert drills[1]["options"] == ["He go", "He goes"] and drills[1]["correct"] == 1
+    assert drills[2]["options"] == ["True", "False"] and drills[2]["correct"] == 1
+
+
+def test_worker_borrows_db_connections_from_a_pool(monkeypatch):
+    calls = []
+    monkeypatch.setenv("BOT_TOKEN", TOKEN)
+    monkeypatch.setattr(bot_module.db, "pool", None)
+    monkeypatch.setattr(bot_module.db, "open_pool", lambda min_size=None, max_size=None: calls.append(("open", max_size)))
+    monkeypatch.setattr(bot_module.db, "close_pool", lambda: calls.append(("close", None)))
+
+    async def tail_inbox(dispatcher, stop):
+        calls.append(("tail", None))
+
+    monkeypatch.setattr(bot_module, "tail_inbox", tail_inbox)
+    asyncio.run(bot_module.run("inbox", shards=1))
+    assert calls == [("open", bot_module.BOT_DB_POOL_SIZE), ("tail", None), ("close", None)]
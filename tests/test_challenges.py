@@ -0,0 +1,33 @@
+import random
+from collections import Counter
+
+from app.challenges import pick_weighted, today
+
+
+def test_pick_weighted_is_deterministic_and_unique():
+    items = list(range(100))
+    a = pick_weighted(items, [1.0] * 100, 10, random.Random("2025-09-01:1"))
+    b = pick_weighted(items, [1.0] * 100, 10, random.Random("2025-09-01:1"))
+    assert a == b
+    assert len(set(a)) == 10
+
+
+def test_pick_weighted_prefers_heavier_items():
+    items = ["weak", "strong"]
+    picks = Counter(pick_weighted(items, [5.0, 1.0], 1, random.Random(seed))[0] for seed in range(2000))
+    assert picks["weak"] > 3 * picks["strong"]
+
+
+def test_daily_challenge_is_served_consistently(api_client):
+    r1 = api_client.get("/challenges/daily", params={"level": 1})
+    r2 = api_client.get("/challenges/daily", params={"level": 1})
+    assert r1.status_code == 200
+    assert r1.content == r2.content
+    data = r1.json()
+    assert data["day"] == today().isoformat()
+    assert data["level"] == 1
+    assert isinstance(data["items"], list)
+
+
+def test_daily_challenge_rejects_unknown_level(api_client):
+    assert api_client.get("/challenges/daily", params={"level": 99}).status_code == 400
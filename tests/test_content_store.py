@@ -0,0 +1,145 @@
+import json
+import os
+
+from app import content_store
+from app.content_store import ContentStore, LessonCache, LessonEntry, lesson_doc, write_store
+from app.main import dumps_json
+
+
+def _records(lessons):
+    out = []
+    for row in lessons:
+        doc = lesson_doc(row)
+        out.append((row["id"], dumps_json(doc), (doc["theory"] or "").encode("utf-8")))
+    return out
+
+
+LESSONS = [
+    {"id": 7, "title": "Past Simple", "topic": "Tenses", "metadata": {"theory": "Вчера я **ходил**…"}},
+    {"id": 3, "title": "Articles", "topic": "Nouns", "metadata": {}},
+    {"id": 12, "title": "Modals", "topic": None, "metadata": None},
+]
+
+
+def test_lookups_are_slices_of_one_mapping(tmp_path):
+    path = str(tmp_path / "content.bin")
+    assert write_store(path, _records(LESSONS)) == 3
+    store = ContentStore(path, check_interval=60)
+    assert store.open() and len(store) == 3
+
+    theory = store.theory(7)
+    assert isinstance(theory, memoryview)
+    assert bytes(theory).decode("utf-8") == "Вчера я **ходил**…"
+    assert bytes(store.doc(7)) == dumps_json(lesson_doc(LESSONS[0]))
+    assert bytes(store.theory(3)) == b""
+    assert store.doc(12) is not None
+    assert store.doc(5) is None and store.doc(100) is None and store.doc(-1) is None
+
+
+def test_readers_remap_after_a_rebuild(tmp_path):
+    path = str(tmp_path / "content.bin")
+    write_store(path, _records(LESSONS[:1]))
+    store = ContentStore(path, check_interval=0)
+    store.open()
+    old_slice = store.doc(7)
+    assert store.doc(3) is None
+
+    write_store(path, _records(LESSONS))
+    assert store.doc(3) is not None
+    # slices handed out before the swap stay valid
+    assert bytes(old_slice).startswith(b"{")
+    assert [f for f in os.listdir(tmp_path) if f.startswith(".content-")] == []
+
+
+def test_missing_store_falls_back_to_the_database(tmp_path):
+    store = ContentStore(str(tmp_path / "absent.bin"))
+    assert store.open() is False
+    assert not store.is_open and store.doc(1) is None
+
+
+def test_lesson_endpoint_serves_the_store_without_queries(api_client, statement_budget, tmp_path, monkeypatch):
+    path = str(tmp_path / "content.bin")
+    write_store(path, _records(LESSONS))
+    store = ContentStore(path)
+    store.open()
+    monkeypatch.setattr(content_store, "store", store)
+
+    r = api_client.get("/lesson/7")
+    assert r.status_code == 200
+    assert r.json() == {
+        "lesson_id": 7, "title": "Past Simple", "topic": "Tenses",
+        "theory": "Вчера я **ходил**…", "metadata": {"theory": "Вчера я **ходил**…"},
+    }
+    assert statement_budget.requests[-1][2] == 0
+
+
+def test_compact_entries_drop_the_duplicated_theory():
+    entry = LessonEntry.from_doc(lesson_doc(LESSONS[0]), dumps_json)
+    assert json.loads(entry.body(compact=True))["metadata"] == {}
+    assert json.loads(entry.body())["metadata"] == {"theory": "Вчера я **ходил**…"}
+    assert entry.etag(compact=True) != entry.etag() and entry.etag().startswith('"')
+    # nothing to drop: one body, one tag
+    plain = LessonEntry.from_doc(lesson_doc(LESSONS[1]), dumps_json)
+    assert plain.body(compact=True) is plain.body() and plain.etag(compact=True) == plain.etag()
+
+
+def test_lesson_cache_is_an_lru_keyed_by_content_version():
+    cache = LessonCache(maxsize=2)
+    entries = [LessonEntry.from_doc(lesson_doc(row), dumps_json) for row in LESSONS]
+    cache.put(7, 1, entries[0])
+    cache.put(3, 1, entries[1])
+    assert cache.get(7, 1, 0.0) is entries[0]
+    cache.put(12, 1, entries[2])
+    assert cache.get(3, 1, 0.0) is None and len(cache) == 2
+    # another store build is another version
+    assert cache.get(7, 2, 0.0) is None
+    cache.put(3, 1, LessonEntry(b"{}", b"{}", expires_at=10.0))
+    assert cache.get(3, 1, 9.0) is not None and cache.get(3, 1, 10.0) is None
+
+
+def _serve_store(tmp_path, monkeypatch, lessons=LESSONS):
+    path = str(tmp_path / "content.bin")
+    write_store(path, _records(lessons))
+    store = ContentStore(path, check_interval=0)
+    store.open()
+    monkeypatch.setattr(content_store, "store", store)
+    monkeypatch.setattr(content_store, "lesson_cache", LessonCache(16))
+    return path
+
+
+def test_lesson_endpoint_revalidates_with_etags(api_client, statement_budget, tmp_path, monkeypatch):
+    path = _serve_store(tmp_path, monkeypatch)
+
+    r = api_client.get("/lesson/7")
+    tag = r.headers["etag"]
+    assert r.status_code == 200 and r.headers["cache-control"] == "public, no-cache"
+    r = api_client.get("/lesson/7", headers={"If-None-Match": f'"other", W/{tag}'})
+    assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == tag
+
+    r = api_client.get("/lesson/7", params={"compact": 1})
+    assert r.json()["metadata"] == {} and r.json()["theory"] == "Вчера я **ходил**…"
+    assert r.headers["etag"] != tag
+
+    # a rebuild with new content is a new version; the cached entry is not reused
+    write_store(path, _records([dict(LESSONS[0], title="Past Simple II")]))
+    r = api_client.get("/lesson/7", headers={"If-None-Match": tag})
+    assert r.status_code == 200 and r.json()["title"] == "Past Simple II"
+    assert all(req[2] == 0 for req in statement_budget.requests)
+
+
+def test_batch_endpoint_keeps_the_requested_order(api_client, statement_budget, tmp_path, monkeypatch):
+    _serve_store(tmp_path, monkeypatch)
+
+    r = api_client.get("/lessons", params={"ids": "12, 7,12", "compact": "true"})
+    assert r.status_code == 200
+    body = r.json()
+    assert [d["lesson_id"] for d in body["lessons"]] == [12, 7] and body["missing"] == []
+    assert body["lessons"][1]["metadata"] == {}
+    assert api_client.get("/lessons", params={"ids": "12,7,12", "compact": "true"},
+                          headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert statement_budget.requests[-1][2] == 0
+
+    assert api_client.get("/lessons", params={"ids": "7,x"}).status_code == 400
+    assert api_client.get("/lessons", params={"ids": ","}).status_code == 400
+    many = ",".join(str(i) for i in range(1, 100))
+    assert api_client.get("/lessons", params={"ids": many}).json()["detail"] == "too_many_ids"
@@ -0,0 +1,23 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.main import FastJSONResponse, dumps_json
+
+
+def test_fast_json_matches_stdlib_shape():
+    doc = {"a": 1, "b": [1.5, None, True], "c": "тест 📚", "d": Decimal("0.5")}
+    body = dumps_json(doc)
+    assert json.loads(body) == {"a": 1, "b": [1.5, None, True], "c": "тест 📚", "d": 0.5}
+
+
+def test_fast_json_serializes_datetimes_as_iso():
+    ts = datetime(2025, 8, 30, 12, 0, tzinfo=timezone.utc)
+    assert dumps_json({"ts": ts}) == b'{"ts":"2025-08-30T12:00:00+00:00"}'
+
+
+def test_fast_json_response_sends_preserialized_bytes_verbatim():
+    body = b'{"group":"grammar","sections":[]}'
+    resp = FastJSONResponse(body)
+    assert resp.body == body
+    assert resp.headers["content-type"] == "application/json"
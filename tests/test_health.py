@@ -0,0 +1,50 @@
+from app import health
+from app.health import Readiness
+
+
+def test_live_touches_nothing(api_client, statement_budget):
+    for path in ("/health", "/health/live"):
+        r = api_client.get(path)
+        assert r.status_code == 200 and r.json() == {"ok": True}
+    assert all(statements == 0 for _, _, statements, _ in statement_budget.requests)
+
+
+def test_ready_reports_every_check(api_client):
+    health.readiness.reset()
+    r = api_client.get("/health/ready")
+    body = r.json()
+    assert r.status_code == (200 if body["ready"] else 503)
+    assert set(body["checks"]) == {"pool", "database", "migrations", "caches", "schema"}
+    assert body["checks"]["migrations"]["expected"] == list(health.expected_heads())
+
+
+def test_migration_tree_has_a_single_head():
+    assert len(health.expected_heads()) == 1
+
+
+def test_report_is_cached_between_probes():
+    calls = []
+    r = Readiness(ttl=60)
+    r.add("db", lambda: calls.append(1) or {"ok": True})
+    assert r.report()["ready"] is True
+    r.report()
+    assert len(calls) == 1
+    r.reset()
+    r.report()
+    assert len(calls) == 2
+
+
+def test_any_failing_or_raising_check_fails_readiness():
+    r = Readiness(ttl=0)
+    r.add("ok", lambda: {"ok": True})
+    r.add("boom", lambda: 1 / 0)
+    report = r.report()
+    assert report["ready"] is False
+    assert report["checks"]["boom"] == {"ok": False, "error": "ZeroDivisionError"}
+
+
+def test_exhausted_pool_is_not_ready(monkeypatch):
+    monkeypatch.setattr(health.db, "pool_stats", lambda: {"size": 10, "available": 0, "waiting": 3, "max": 10})
+    assert health.check_pool()["ok"] is False
+    monkeypatch.setattr(health.db, "pool_stats", lambda: {"size": 4, "available": 0, "waiting": 0, "max": 10})
+    assert health.check_pool()["ok"] is True
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import httpx
+
+from app import db
+from app.metrics import (Counter, Gauge, Histogram, MetricsMiddleware, Registry, http_requests_total,
+                         read_snapshots, write_snapshot)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, "/a")
+    h.observe(0.5, "/a")
+    h.observe(5.0, "/a")
+    text = "\n".join(h.render())
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+    assert h.count("/a") == 3
+
+
+def test_counter_escapes_label_values():
+    c = Counter("demo_total", "Demo.", ("path",))
+    c.inc('a"b')
+    assert 'demo_total{path="a\\"b"} 1' in c.render()
+
+
+def test_metrics_endpoint_reports_route_templates(api_client):
+    before = http_requests_total.value("GET", "/health", "200")
+    assert api_client.get("/health").status_code == 200
+    assert http_requests_total.value("GET", "/health", "200") == before + 1
+
+    r = api_client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health"}' in r.text
+    assert "http_requests_in_flight" in r.text
+
+
+def test_query_name_reports_statement_timings():
+    seen = []
+    db.query_observers.append(lambda name, seconds, rows: seen.append((name, rows)))
+    stats = db.RequestStats()
+    token = db.request_stats.set(stats)
+    try:
+        with db.query_name("demo"):
+            db._record(0.002, 3)
+        db._record(0.001, -1)
+    finally:
+        db.request_stats.reset(token)
+        db.query_observers.pop()
+    assert seen == [("demo", 3)]
+    assert stats.statements == 2 and stats.rows == 3
+    assert abs(stats.db_seconds - 0.003) < 1e-9
+
+
+def test_debug_mode_reports_statements_in_headers():
+    async def handler(scope, receive, send):
+        for _ in range(3):
+            db._record(0.001, 1)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    app = MetricsMiddleware(handler, debug=True)
+    transport = httpx.ASGITransport(app=app)
+
+    async def call():
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await client.get("/x")
+
+    r = asyncio.run(call())
+    assert r.headers["x-db-statements"] == "3"
+    assert r.headers["x-db-round-trips"] == "3"
+    assert float(r.headers["x-db-time-ms"]) > 0
+
+
+def test_statement_budget_flags_n_plus_one(statement_budget):
+    stats = db.RequestStats()
+    stats.statements = 12
+    statement_budget("GET", "/tasks/next", stats)
+    assert statement_budget.violations() == ["GET /tasks/next: 12 statements (budget 1)"]
+    statement_budget.requests.clear()
+
+
+def test_worker_snapshots_are_merged(tmp_path):
+    def registry():
+        reg = Registry()
+        return reg, reg.register(Counter("req_total", "R.", ("route",))), \
+            reg.register(Gauge("busy", "B.")), reg.register(Gauge("startup", "S.", merge="max")), \
+            reg.register(Histogram("lat", "L.", buckets=(1.0,)))
+
+    snapshots = []
+    for n, live in ((1, True), (2, True), (5, False)):
+        reg, req, busy, startup, lat = registry()
+        req.inc("/a", amount=n)
+        busy.set(n)
+        startup.set(n)
+        lat.observe(0.5 * n)
+        snapshots.append((json.loads(json.dumps(reg.snapshot())), live))
+    reg, *_ = registry()
+    text = reg.render_merged(snapshots)
+    # counters and histograms of exited workers still count; gauges don't
+    assert 'req_total{route="/a"} 8' in text
+    assert "busy 3" in text and "startup 2" in text
+    assert 'lat_bucket{le="1.0"} 2' in text and 'lat_bucket{le="+Inf"} 3' in text
+
+    write_snapshot(str(tmp_path), reg)
+    assert read_snapshots(str(tmp_path)) == [(reg.snapshot(), True)]
@@ -0,0 +1,125 @@
+import random
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import db
+from app.partitions import add_months, expired_months, list_partitions, partition_month, roll_up_partition
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2025, 11, 1), 2) == date(2026, 1, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_partition_names_map_to_months():
+    assert partition_month("task_attempt_p202509") == date(2025, 9, 1)
+    assert partition_month("task_attempt_default") is None
+
+
+def test_only_months_outside_retention_expire():
+    months = [date(2024, m, 1) for m in range(1, 13)] + [date(2025, m, 1) for m in range(1, 10)]
+    expired = expired_months(months, date(2025, 9, 17), retention=12)
+    # September 2025 plus the 11 months before it are kept
+    assert expired == [date(2024, m, 1) for m in range(1, 10)]
+    assert expired_months(months, date(2025, 9, 17), retention=0) == []
+
+
+# ---- Database ----
+
+def _month_without_partition(cur) -> date:
+    # a month far in the past, so live partitions and other runs don't collide
+    while True:
+        month = date(random.randint(1970, 1999), random.randint(1, 12), 1)
+        cur.execute("SELECT to_regclass(%s)", (f"task_attempt_p{month:%Y%m}",))
+        if cur.fetchone()[0] is None:
+            return month
+
+
+def _user_and_tasks(cur, n=1):
+    cur.execute("INSERT INTO app_user (email) VALUES (%s) RETURNING id", (f"p-{uuid.uuid4().hex[:8]}@example.com",))
+    user_id = cur.fetchone()[0]
+    cur.execute("INSERT INTO lesson (title, topic) VALUES ('P', 'grammar') RETURNING id")
+    lesson_id = cur.fetchone()[0]
+    tasks = []
+    for _ in range(n):
+        cur.execute("INSERT INTO task (lesson_id, content, answer) VALUES (%s, '{}'::jsonb, '{}'::jsonb) RETURNING id",
+                    (lesson_id,))
+        tasks.append(cur.fetchone()[0])
+    return user_id, lesson_id, tasks
+
+
+def _attempt(cur, user_id, task_id, at, is_correct=False):
+    cur.execute("INSERT INTO task_attempt (user_id, task_id, submitted_at, is_correct) VALUES (%s, %s, %s, %s)",
+                (user_id, task_id, at, is_correct))
+
+
+@pytest.fixture
+def conn():
+    with db.connect() as c:
+        yield c
+
+
+def test_new_partition_takes_over_rows_from_the_default(conn):
+    with conn.cursor() as cur:
+        month = _month_without_partition(cur)
+        user_id, _, (task_id,) = _user_and_tasks(cur)
+        _attempt(cur, user_id, task_id, datetime(month.year, month.month, 3, tzinfo=timezone.utc))
+        cur.execute("SELECT tableoid::regclass::text FROM task_attempt WHERE user_id = %s", (user_id,))
+        assert cur.fetchone()[0] == "task_attempt_default"
+
+        cur.execute("SELECT create_task_attempt_partition(%s)", (month,))
+        name = cur.fetchone()[0]
+        cur.execute("SELECT tableoid::regclass::text FROM task_attempt WHERE user_id = %s", (user_id,))
+        assert [r[0] for r in cur.fetchall()] == [name]
+        cur.execute("SELECT count(*) FROM task_attempt_default WHERE user_id = %s", (user_id,))
+        assert cur.fetchone()[0] == 0
+        roll_up_partition(conn, name)
+
+
+def test_roll_up_adds_daily_counts_and_drops_the_partition(conn):
+    with conn.cursor() as cur:
+        month = _month_without_partition(cur)
+        cur.execute("SELECT create_task_attempt_partition(%s)", (month,))
+        name = cur.fetchone()[0]
+        user_id, _, (task_id,) = _user_and_tasks(cur)
+        day1 = datetime(month.year, month.month, 1, 10, tzinfo=timezone.utc)
+        day2 = datetime(month.year, month.month, 2, 10, tzinfo=timezone.utc)
+        _attempt(cur, user_id, task_id, day1, True)
+        _attempt(cur, user_id, task_id, day1, False)
+        _attempt(cur, user_id, task_id, day2, True)
+        # counts already rolled up for that day are added to, not replaced
+        cur.execute("INSERT INTO task_attempt_daily (user_id, task_id, day, attempts, correct) VALUES (%s, %s, %s, 5, 2)",
+                    (user_id, task_id, day1.date()))
+
+    assert roll_up_partition(conn, name, drop=True) == 2
+    with conn.cursor() as cur:
+        cur.execute("SELECT day, attempts, correct FROM task_attempt_daily WHERE user_id = %s ORDER BY day", (user_id,))
+        assert cur.fetchall() == [(day1.date(), 7, 3), (day2.date(), 1, 1)]
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        assert cur.fetchone()[0] is None
+        assert name not in [n for n, _ in list_partitions(cur)]
+        cur.execute("SELECT count(*) FROM task_attempt WHERE user_id = %s", (user_id,))
+        assert cur.fetchone()[0] == 0
+
+
+def test_next_task_counts_raw_and_rolled_up_attempts(conn):
+    from app.main import NEXT_TASK_FOR_USER
+
+    now = datetime.now(timezone.utc)
+    with conn.cursor() as cur:
+        user_id, lesson_id, (a, b, c) = _user_and_tasks(cur, 3)
+        for task_id, raw in ((a, 2), (b, 1)):
+            for _ in range(raw):
+                _attempt(cur, user_id, task_id, now)
+        cur.execute("INSERT INTO task_attempt_daily (user_id, task_id, day, attempts, correct) VALUES (%s, %s, '1999-01-01', 5, 0)",
+                    (user_id, c))
+        params = {"user_id": user_id, "lesson_id": lesson_id}
+        cur.execute(NEXT_TASK_FOR_USER, params)
+        assert cur.fetchone()[0] == b  # 1 raw < 2 raw < 5 rolled up
+
+        cur.execute("INSERT INTO task_attempt_daily (user_id, task_id, day, attempts, correct) VALUES (%s, %s, '1999-01-01', 3, 0)",
+                    (user_id, b))
+        cur.execute(NEXT_TASK_FOR_USER, params)
+        assert cur.fetchone()[0] == a  # b is now 1 + 3
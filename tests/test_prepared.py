@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import db, main, schema
+from bench.prepared import format_results
+
+
+HOT_QUERIES = {
+    "attempt_task", "attempt_insert", "attempt_progress", "get_lessons", "next_task_user", "next_task_guest",
+    "progress_summary_lessons", "progress_summary_weak", "lessons_overview", "lessons_overview_all",
+}
+
+
+def test_hot_queries_are_registered_as_prepared():
+    main._lessons_overview_queries(schema.current.lesson_topic, schema.current.lesson_subtopic)
+    assert HOT_QUERIES <= set(db.prepared_queries)
+    for name in HOT_QUERIES:
+        query = db.prepared_queries[name]
+        assert isinstance(query, db.PreparedQuery) and query.name == name
+    assert main.LESSONS_BY_ID is db.prepared_queries["get_lessons"]
+
+
+def test_lessons_overview_text_does_not_depend_on_the_request():
+    first = main._lessons_overview_queries("l.topic", "NULL::text")
+    assert main._lessons_overview_queries("l.topic", "NULL::text") is first
+    filtered, everything = first
+    # patterns and the hierarchy filter are parameters, not spliced into the SQL
+    assert "Grammar" not in filtered and "%(patterns)s" in filtered and "%(path)s" in filtered
+    assert "ILIKE" not in everything
+
+
+def test_pgbouncer_mode_disables_server_side_prepares():
+    code = "from app import db; print(db.PREPARE_THRESHOLD)"
+    env = dict(os.environ, DB_PGBOUNCER="1")
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "None"
+    env["DB_PGBOUNCER"] = "0"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "5"
+
+
+def test_bench_report_shows_saved_share():
+    lines = format_results({
+        "get_lesson": {"planning_ms": 0.05, "unprepared_ms": 0.2, "prepared_ms": 0.15},
+        "next_task_user": {"planning_ms": None, "unprepared_ms": 0.0, "prepared_ms": 0.0},
+    })
+    assert lines[1].split()[0] == "get_lesson" and lines[1].endswith("25%")
+    assert lines[2].split()[1] == "-" and lines[2].endswith("-")
+
+
+def _prepared_statements(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT statement FROM pg_prepared_statements", prepare=False)
+        return [r[0] for r in cur.fetchall()]
+
+
+@pytest.mark.skipif(db.DB_PGBOUNCER, reason="prepares are disabled behind PgBouncer")
+def test_hot_query_is_prepared_on_first_execution():
+    with db.connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(main.LESSONS_BY_ID, ([1],))
+            cur.fetchall()
+        assert any("FROM lesson WHERE id = ANY($1" in s for s in _prepared_statements(conn))
+    with db.connect(prepare_threshold=None) as conn:
+        with conn.cursor() as cur:
+            cur.execute(main.LESSONS_BY_ID, ([1],))
+            cur.fetchall()
+        assert not any("FROM lesson WHERE id = ANY($1" in s for s in _prepared_statements(conn))
@@ -0,0 +1,110 @@
+import time
+
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from app import main as app_main
+from app.ratelimit import MemoryBackend, RateLimiter, Rule
+
+
+def make_limiter(**rules):
+    return RateLimiter(MemoryBackend(), rules=rules)
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    limiter = make_limiter(attempts=Rule(rate=1.0, burst=3))
+    decisions = [limiter.check("attempts", "u1") for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[-1].reason == "rate_limited"
+    assert decisions[-1].retry_after >= 1
+    # other subjects have their own bucket
+    assert limiter.check("attempts", "u2").allowed
+
+
+def test_token_bucket_refills_over_time():
+    backend = MemoryBackend()
+    rule = Rule(rate=10.0, burst=1)
+    now = time.monotonic()
+    assert backend.take_token("k", rule, now)[0]
+    assert not backend.take_token("k", rule, now + 0.01)[0]
+    assert backend.take_token("k", rule, now + 0.2)[0]
+
+
+def test_daily_quota_applies_to_free_plan_only():
+    limiter = make_limiter(attempts=Rule(rate=1000.0, burst=1000, free_daily=2))
+    assert [limiter.check("attempts", "u1").allowed for _ in range(3)] == [True, True, False]
+    assert limiter.check("attempts", "u1").reason == "daily_quota_exceeded"
+    assert all(limiter.check("attempts", "u9", plan="pro").allowed for _ in range(5))
+
+
+def test_check_costs_microseconds():
+    limiter = make_limiter(attempts=Rule(rate=1e9, burst=10**9, free_daily=10**9))
+    n = 20000
+    started = time.perf_counter()
+    for i in range(n):
+        limiter.check("attempts", f"u{i % 100}")
+    per_call = (time.perf_counter() - started) / n
+    assert per_call < 50e-6
+
+
+def test_auth_tg_is_shielded_before_touching_the_db(monkeypatch):
+    monkeypatch.setattr(app_main, "rate_limiter", make_limiter(auth_tg=Rule(rate=0.01, burst=0)))
+    client = httpx.Client(transport=ASGITransport(app=app_main.app), base_url="http://testserver")
+    r = client.post("/auth/tg", json={"tg_user_id": 1})
+    assert r.status_code == 429
+    assert r.json()["detail"] == "rate_limited"
+    assert int(r.headers["Retry-After"]) >= 1
+
+
+def test_memory_backend_evicts_least_recently_used_buckets(monkeypatch):
+    monkeypatch.setattr(MemoryBackend, "MAX_KEYS", 3)
+    backend = MemoryBackend()
+    rule = Rule(rate=0.001, burst=1)
+    for key in ("a", "b", "c"):
+        backend.take_token(key, rule, 0.0)
+    assert not backend.take_token("a", rule, 1.0)[0]  # "a" is now the most recent
+    backend.take_token("d", rule, 2.0)
+    assert list(backend._buckets) == ["c", "a", "d"]
+
+
+def test_client_ip_comes_from_the_trusted_proxy_hop(monkeypatch):
+    from starlette.requests import Request
+
+    def request(forwarded):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 5000)})
+
+    assert app_main._client_ip(request("1.2.3.4")) == "10.0.0.1"
+    monkeypatch.setattr(app_main, "RATE_LIMIT_TRUST_PROXY", 1)
+    # a client-supplied entry on the left is not trusted
+    assert app_main._client_ip(request("6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    assert app_main._client_ip(request("")) == "10.0.0.1"
+    monkeypatch.setattr(app_main, "RATE_LIMIT_TRUST_PROXY", 2)
+    assert app_main._client_ip(request("6.6.6.6, 1.2.3.4, 10.1.1.1")) == "1.2.3.4"
+
+
+def test_quota_is_checked_before_the_bucket():
+    backend = MemoryBackend()
+    limiter = RateLimiter(backend, rules={"attempts": Rule(rate=0.001, burst=2, free_daily=3)})
+    assert [limiter.check("attempts", "u1").reason for _ in range(4)] == [None, None, "rate_limited", "rate_limited"]
+    # throttled requests handed their quota back
+    assert sum(backend._daily.values()) == 2
+    limiter = RateLimiter(MemoryBackend(), rules={"attempts": Rule(rate=0.001, burst=5, free_daily=1)})
+    limiter.check("attempts", "u1")
+    assert limiter.check("attempts", "u1").reason == "daily_quota_exceeded"
+    assert limiter.backend._buckets["attempts:u1"][0] == 4  # the refused request kept its token
+
+
+def test_only_a_verified_session_gets_a_per_user_bucket(monkeypatch):
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    monkeypatch.setattr(app_main, "rate_limiter", make_limiter(tasks_next=Rule(rate=0.001, burst=1)))
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 5000)})
+    app_main._enforce_limit(request, "tasks_next")
+    # without a token a raw user_id is never consulted: the address is already spent
+    with pytest.raises(HTTPException) as e:
+        app_main._enforce_limit(request, "tasks_next")
+    assert e.value.status_code == 429
+    app_main._enforce_limit(request, "tasks_next", {"uid": 7, "plan": "free"})
@@ -0,0 +1,82 @@
+import os
+
+import psycopg
+import pytest
+
+from app import db
+from app.db import StickyPrimary
+
+
+REPLICA_URLS = [u for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+
+
+def test_sticky_marks_expire_and_belong_to_one_user():
+    sticky = StickyPrimary(slots=8)
+    sticky.mark(42, 5, now=100.0)
+    assert sticky.active(42, now=104.0)
+    assert not sticky.active(42, now=105.5)
+    # 50 shares the slot: the newer mark evicts the older one
+    sticky.mark(50, 5, now=100.0)
+    assert sticky.active(50, now=101.0) and not sticky.active(42, now=101.0)
+
+
+def test_marks_are_visible_to_forked_workers():
+    sticky = StickyPrimary(slots=8)
+    pid = os.fork()
+    if pid == 0:
+        sticky.mark(7, 60)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert sticky.active(7)
+
+
+def test_reads_go_round_robin_to_replicas_unless_the_user_just_wrote(monkeypatch):
+    monkeypatch.setattr(db, "REPLICA_URLS", ["postgresql://r0", "postgresql://r1"])
+    monkeypatch.setattr(db, "sticky_primary", StickyPrimary(slots=64))
+    monkeypatch.setattr(db, "DB_REPLICA_STICKY_SECONDS", 5.0)
+    assert {db.route(), db.route()} == {0, 1}
+    assert db.route(user_id=9) is not None
+    db.mark_write(9)
+    assert db.route(user_id=9) is None
+    assert db.route(user_id=10) is not None
+
+
+def test_without_replicas_everything_reads_from_the_primary(monkeypatch):
+    monkeypatch.setattr(db, "REPLICA_URLS", [])
+    db.mark_write(9)
+    assert db.route() is None and db.route(user_id=9) is None
+
+
+def test_unreachable_replica_falls_back_to_the_primary(monkeypatch):
+    monkeypatch.setattr(db, "REPLICA_URLS", ["postgresql://app@127.0.0.1:1/appdb"])
+    primary = []
+    monkeypatch.setattr(db, "connect", lambda *a, **kw: primary.append(kw) or _Conn())
+    with db._replica(0) as conn:
+        assert isinstance(conn, _Conn)
+    assert primary == [{}]
+
+
+class _Conn:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _server(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT inet_server_port(), pg_is_in_recovery()")
+        return cur.fetchone()
+
+
+@pytest.mark.skipif(not REPLICA_URLS, reason="DATABASE_REPLICA_URLS not set")
+def test_read_intent_reaches_the_replica_and_writes_stick_to_the_primary():
+    with psycopg.connect(db.DB_URL) as conn:
+        primary = _server(conn)
+    with db.connect(read_only=True) as conn:
+        assert _server(conn) != primary
+    user_id = 2_000_000_001
+    db.mark_write(user_id)
+    with db.connect(read_only=True, user_id=user_id) as conn:
+        assert _server(conn) == primary
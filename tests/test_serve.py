@@ -0,0 +1,85 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from app import serve
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_pool_sizes_keep_total_connections_bounded():
+    for workers in (1, 2, 3, 8, 16):
+        low, high = serve.pool_sizes(workers, total=40, reserved=2, min_size=2)
+        assert workers * (high + 2) <= 40 or high == 1
+        assert 1 <= low <= high
+    assert serve.pool_sizes(4, total=40, reserved=2, min_size=2) == (2, 8)
+    # more workers than the budget allows still get one pooled connection each
+    assert serve.pool_sizes(64, total=40, reserved=2, min_size=2) == (1, 1)
+
+
+def test_multiple_workers_share_rate_limits():
+    assert serve.rate_limit_backend(1, None) == "memory"
+    assert serve.rate_limit_backend(4, None) == "postgres"
+    assert serve.rate_limit_backend(4, "postgres") == "postgres"
+    assert serve.rate_limit_backend(4, "memory", enabled=False) == "memory"
+    with pytest.raises(SystemExit):
+        serve.rate_limit_backend(4, "memory")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_workers_share_one_socket_and_stop_on_sigterm():
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL="postgresql://app@127.0.0.1:1/appdb",
+        APP_WARMUP_TIMEOUT="0.5",
+        DB_POOL_TIMEOUT="0.5",
+        METRICS_SNAPSHOT_INTERVAL="0.2",
+        PYTHONPATH=ROOT_DIR,
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+         "--graceful-timeout", "2"],
+        env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        status = None
+        while time.monotonic() < deadline:
+            try:
+                status = httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code
+                break
+            except httpx.TransportError:
+                time.sleep(0.2)
+        assert status == 200
+        for _ in range(5):
+            assert httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200
+
+        # whichever worker answers the scrape reports requests served by both
+        time.sleep(0.6)
+        line = re.compile(r'^http_requests_total\{method="GET",route="/health/live",status="200"\} (\d+)$', re.M)
+        # (polls that timed out during start-up may still have been served)
+        totals = {int(line.search(httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).text).group(1))
+                  for _ in range(4)}
+        assert len(totals) == 1 and totals.pop() >= 6
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            code = proc.wait(timeout=20)
+        finally:
+            proc.kill()
+        stderr = proc.stderr.read()
+    assert code == 0, stderr
+    assert "serving with 2 workers" in stderr
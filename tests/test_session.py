@@ -0,0 +1,52 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.session import SessionError, bearer_token, issue_token, verify_token
+
+
+def test_token_roundtrip_carries_plan_and_entitlements():
+    token, exp = issue_token(42, 777, "free", {"progress_summary": True})
+    claims = verify_token(token)
+    assert claims["uid"] == 42
+    assert claims["tg"] == 777
+    assert claims["plan"] == "free"
+    assert claims["ent"] == {"progress_summary": True}
+    assert claims["exp"] == exp
+
+
+def test_tampered_token_is_rejected():
+    token, _ = issue_token(42, None, "free", {})
+    version, payload, sig = token.split(".")
+    forged, _ = issue_token(1, None, "pro", {})
+    with pytest.raises(SessionError) as e:
+        verify_token(f"{version}.{forged.split('.')[1]}.{sig}")
+    assert e.value.reason == "invalid_session"
+
+
+def test_expired_token_is_rejected():
+    token, exp = issue_token(42, None, "free", {}, ttl=60)
+    with pytest.raises(SessionError) as e:
+        verify_token(token, now=exp + 1)
+    assert e.value.reason == "session_expired"
+
+
+def test_pro_session_does_not_outlive_pro_until():
+    pro_until = datetime.now(timezone.utc) + timedelta(seconds=30)
+    _, exp = issue_token(42, None, "pro", {}, pro_until=pro_until, ttl=3600)
+    assert exp <= int(time.time()) + 31
+
+
+def test_lapsed_pro_gets_a_live_free_session():
+    pro_until = datetime.now(timezone.utc) - timedelta(minutes=5)
+    token, exp = issue_token(42, None, "pro", {}, pro_until=pro_until, ttl=3600)
+    assert exp > time.time()
+    assert verify_token(token)["plan"] == "free"
+
+
+def test_bearer_token_parsing():
+    assert bearer_token("Bearer abc") == "abc"
+    assert bearer_token("bearer  abc ") == "abc"
+    assert bearer_token("Basic abc") is None
+    assert bearer_token(None) is None
@@ -0,0 +1,99 @@
+import os
+
+import psycopg
+import pytest
+from psycopg import sql
+from psycopg.types.json import Json
+
+from app import db, slowlog
+from app.slowlog import SlowQueryLog, param_shape, statement_sql, statement_text, summarize_plan
+
+
+def test_param_shape_hides_values():
+    assert param_shape((1, "secret", None, [1, 2], Json({"a": 1}))) == ["int", "str(6)", "null", "list[2]", "Json(dict)"]
+    assert param_shape({"uid": 7, "q": "abc"}) == {"uid": "int", "q": "str(3)"}
+    assert param_shape(None) is None
+
+
+def test_statement_text_collapses_whitespace():
+    assert statement_text("SELECT  1\n   FROM t") == "SELECT 1 FROM t"
+    assert statement_text(sql.SQL("SELECT {} FROM t").format(sql.Identifier("col"))) == 'SELECT "col" FROM t'
+
+
+def test_slow_statements_are_aggregated_by_fingerprint():
+    log = SlowQueryLog(threshold_ms=10)
+    log.observe(None, "SELECT * FROM task WHERE id=%s", (1,), 0.005)  # under threshold
+    with db.query_name("next_task"):
+        log.observe(None, "SELECT * FROM task WHERE id=%s", (1,), 0.050)
+        log.observe(None, "SELECT *\n FROM task WHERE id=%s", (2,), 0.020)
+    log.observe(None, "SELECT 1", None, 0.011)
+    top = log.top()
+    assert [e["count"] for e in top] == [2, 1]
+    first = top[0]
+    assert first["query"] == "next_task"
+    assert first["param_shape"] == ["int"]
+    assert first["max_ms"] == 50.0
+    assert "_params" not in first
+
+
+def test_slow_log_is_bounded():
+    log = SlowQueryLog(threshold_ms=1, max_statements=3)
+    for i in range(10):
+        log.observe(None, f"SELECT {i}", None, 0.002 + i / 1000)
+    assert [e["statement"] for e in log.top()] == ["SELECT 9", "SELECT 8", "SELECT 7"]
+
+
+def test_plan_summary_lists_seq_scans():
+    doc = {
+        "Planning Time": 0.2,
+        "Execution Time": 3.5,
+        "Plan": {
+            "Node Type": "Hash Join", "Actual Rows": 10, "Shared Hit Blocks": 4, "Shared Read Blocks": 1,
+            "Plans": [{"Node Type": "Seq Scan", "Relation Name": "lesson"}, {"Node Type": "Index Scan", "Relation Name": "task"}],
+        },
+    }
+    summary = summarize_plan(doc)
+    assert summary["execution_ms"] == 3.5
+    assert summary["seq_scans"] == ["lesson"]
+
+
+def test_admin_slow_report_requires_token(api_client):
+    assert api_client.get("/admin/db/slow").status_code == 403
+    r = api_client.get("/admin/db/slow", headers={"X-Admin-Token": os.environ["ADMIN_TOKEN"]})
+    assert r.status_code == 200
+    assert "statements" in r.json()
+
+
+def test_raw_statement_is_kept_for_explain():
+    log = SlowQueryLog(threshold_ms=1)
+    log.observe(None, "SELECT 1 -- why\nFROM task", None, 0.01)
+    entry = log._entries[log.top()[0]["fingerprint"]]
+    assert entry["statement"] == "SELECT 1 -- why FROM task"
+    assert entry["_sql"] == "SELECT 1 -- why\nFROM task"
+    assert statement_sql(b"SELECT 1\n") == "SELECT 1\n"
+
+
+def test_explain_of_a_commented_multiline_query_succeeds():
+    from app.main import NEXT_TASK_FOR_USER
+
+    assert "--" in NEXT_TASK_FOR_USER and "\n" in NEXT_TASK_FOR_USER
+    log = SlowQueryLog(threshold_ms=1)
+    log.observe(None, NEXT_TASK_FOR_USER, {"user_id": 1, "lesson_id": 1}, 0.5)
+    assert log.explain_top() == 1
+    plan = log.top()[0]["explain"]
+    assert "error" not in plan and plan["node"]
+
+
+def test_explain_connection_has_a_connect_timeout(monkeypatch):
+    seen = {}
+
+    def connect(url, **kwargs):
+        seen.update(kwargs)
+        raise psycopg.OperationalError("timeout expired")
+
+    monkeypatch.setattr(slowlog.psycopg, "connect", connect)
+    log = SlowQueryLog(threshold_ms=1)
+    log.observe(None, "SELECT 1", None, 0.01)
+    with pytest.raises(psycopg.OperationalError):
+        log.explain_top()
+    assert seen["connect_timeout"] >= 1
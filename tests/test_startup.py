@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+from app import main
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Cold-start budget, measured in a fresh interpreter against a database that
+# never answers: importing app.main must not touch the network, and startup
+# (lifespan until the app accepts requests) is bounded by the warm-up timeout.
+IMPORT_BUDGET_S = 3.0
+WARMUP_TIMEOUT_S = 1.0
+STARTUP_BUDGET_S = WARMUP_TIMEOUT_S + 2.0
+
+_PROBE = """
+import asyncio, json, os, time
+started = time.perf_counter()
+import app.main as m
+imported = time.perf_counter() - started
+
+async def probe():
+    import httpx
+    app = m.create_app(m.Settings(warmup_timeout=%(timeout)r, background_jobs=False))
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        started_in = time.perf_counter() - t0
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            live = (await client.get("/health/live")).status_code
+            ready = (await client.get("/health/ready")).status_code
+        print(json.dumps({"import": imported, "startup": started_in, "live": live, "ready": ready}), flush=True)
+        os._exit(0)  # don't wait for pool threads still dialing the dead host
+
+asyncio.run(probe())
+"""
+
+
+def test_cold_start_budget_with_unreachable_database():
+    env = dict(
+        os.environ,
+        # non-routable address: connects hang instead of failing fast
+        DATABASE_URL="postgresql://app@10.255.255.1:5432/appdb",
+        DB_POOL_TIMEOUT="30",
+        PYTHONPATH=ROOT_DIR,
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE % {"timeout": WARMUP_TIMEOUT_S}],
+        env=env, cwd=ROOT_DIR, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["import"] < IMPORT_BUDGET_S, result
+    assert result["startup"] < STARTUP_BUDGET_S, result
+    assert result["live"] == 200
+    assert result["ready"] == 503
+
+
+def test_legacy_mount_serves_only_allowlisted_files(api_client):
+    assert api_client.get("/legacy/grammar.js").status_code == 200
+    assert api_client.get("/legacy/exercises_data/general_practice/tenses_drills.json").status_code == 200
+    for path in ("requirements.txt", "app/main.py", ".env", "alembic.ini", "exercises_data/../app/db.py",
+                 "exercises_data/notes.md"):
+        assert api_client.get(f"/legacy/{path}").status_code == 404, path
+
+
+def test_factory_builds_independent_apps():
+    a = main.create_app(main.Settings(static_dir=None))
+    b = main.create_app()
+    assert a is not b and a.router is not b.router
+    assert not any(getattr(r, "path", "") == "/static" for r in a.routes)
+    assert any(getattr(r, "path", "") == "/static" for r in b.routes)
@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from app import main as app_main
+from app.telegram import BotAPIClient, CircuitBreaker, TelegramAPIError, TelegramUnavailable
+
+TOKEN = "42:MOCK"
+
+
+def _call(api, method, payload=None, **kwargs):
+    async def _run():
+        client = BotAPIClient(TOKEN, base_url=api.base_url, **kwargs)
+        try:
+            return await client.call(method, payload)
+        finally:
+            await client.aclose()
+    return asyncio.run(_run())
+
+
+def test_retries_transient_errors(fake_bot_api, monkeypatch):
+    monkeypatch.setattr("app.telegram.backoff_delay", lambda attempt: 0)
+    fake_bot_api.script = [
+        (502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}),
+        (200, {"ok": False, "error_code": 429, "description": "Too Many", "parameters": {"retry_after": 0}}),
+        (200, {"ok": True, "result": {"id": 1}}),
+    ]
+    assert _call(fake_bot_api, "getMe", max_retries=3) == {"id": 1}
+    assert [path for path, _ in fake_bot_api.calls] == [f"/bot{TOKEN}/getMe"] * 3
+
+
+def test_client_errors_are_not_retried(fake_bot_api):
+    fake_bot_api.script = [(400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"})]
+    with pytest.raises(TelegramAPIError) as e:
+        _call(fake_bot_api, "sendMessage", {"chat_id": 1, "text": "hi"})
+    assert e.value.error_code == 400
+    assert len(fake_bot_api.calls) == 1
+
+
+def test_circuit_opens_after_repeated_failures(fake_bot_api, monkeypatch):
+    monkeypatch.setattr("app.telegram.backoff_delay", lambda attempt: 0)
+    fake_bot_api.script = [(500, {"ok": False, "error_code": 500, "description": "Internal"})]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    async def _run():
+        client = BotAPIClient(TOKEN, base_url=fake_bot_api.base_url, max_retries=0, breaker=breaker)
+        try:
+            for _ in range(3):
+                with pytest.raises(TelegramUnavailable):
+                    await client.call("getMe")
+        finally:
+            await client.aclose()
+
+    asyncio.run(_run())
+    assert breaker.state == "open"
+    # the third call failed fast without reaching the server
+    assert len(fake_bot_api.calls) == 2
+
+
+def test_invoice_link_is_cached_per_configuration(fake_bot_api, monkeypatch):
+    monkeypatch.setenv("TELEGRAM_API_BASE", fake_bot_api.base_url)
+    monkeypatch.setenv("BOT_TOKEN", TOKEN)
+    monkeypatch.setenv("PRO_PROVIDER_TOKEN", "provider")
+    monkeypatch.setenv("PRO_PRICE_CENTS", "499")
+    monkeypatch.setattr(app_main, "_invoice_link_cache", {})
+    fake_bot_api.script = [(200, {"ok": True, "result": "https://t.me/$invoice"})]
+
+    async def _run():
+        transport = ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return [await client.post("/billing/create_invoice_link") for _ in range(3)]
+
+    responses = asyncio.run(_run())
+    assert [r.json() for r in responses] == [{"url": "https://t.me/$invoice"}] * 3
+    assert len(fake_bot_api.calls) == 1
+    path, body = fake_bot_api.calls[0]
+    assert path == f"/bot{TOKEN}/createInvoiceLink"
+    assert body["prices"] == [{"label": "Pro", "amount": 499}]
+
+
+def _call_with(responses, method, monkeypatch, **kwargs):
+    """Call through a mock transport; `responses` are exceptions or JSON bodies."""
+    monkeypatch.setattr("app.telegram.backoff_delay", lambda attempt: 0)
+    sent = []
+
+    def handler(request):
+        sent.append(request.url.path)
+        item = responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return httpx.Response(200, json=item)
+
+    async def _run():
+        client = BotAPIClient(TOKEN, transport=httpx.MockTransport(handler), **kwargs)
+        try:
+            return await client.call(method, {"chat_id": 1, "text": "hi"})
+        finally:
+            await client.aclose()
+
+    return asyncio.run(_run()), sent
+
+
+def test_send_message_is_retried_only_when_it_never_reached_telegram(monkeypatch):
+    ok = {"ok": True, "result": {"message_id": 1}}
+    result, sent = _call_with([httpx.ConnectError("refused"), ok], "sendMessage", monkeypatch)
+    assert result == {"message_id": 1} and len(sent) == 2
+
+    for unknown in (httpx.ReadTimeout("slow"), {"ok": False, "error_code": 502, "description": "Bad Gateway"}):
+        with pytest.raises(TelegramUnavailable):
+            _call_with([unknown, ok], "sendMessage", monkeypatch)
+    # the same outcome is safe to retry for a read-only method
+    result, sent = _call_with([httpx.ReadTimeout("slow"), ok], "getMe", monkeypatch)
+    assert len(sent) == 2
+
+
+def test_long_flood_wait_fails_instead_of_sleeping(monkeypatch):
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr("app.telegram.asyncio.sleep", sleep)
+    flood = {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 3600}}
+    with pytest.raises(TelegramUnavailable):
+        _call_with([flood], "sendMessage", monkeypatch, max_retry_after=5)
+    short = dict(flood, parameters={"retry_after": 2})
+    result, sent = _call_with([short, {"ok": True, "result": True}], "sendMessage", monkeypatch, max_retry_after=5)
+    assert result is True and slept == [2.0]
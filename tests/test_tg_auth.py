@@ -0,0 +1,63 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+from app import tg_auth
+from app.tg_auth import InitDataError, verify_init_data
+
+BOT_TOKEN = "123456:TEST"
+
+
+def make_init_data(tg_user_id: int, auth_date: int, token: str = BOT_TOKEN) -> str:
+    fields = {"auth_date": str(auth_date), "query_id": "AAE", "user": json.dumps({"id": tg_user_id})}
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret = hashlib.sha256(token.encode()).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    tg_auth._verified.clear()
+    yield
+    tg_auth._verified.clear()
+
+
+def test_valid_init_data_returns_user_and_is_cached():
+    init_data = make_init_data(555, int(time.time()))
+    assert verify_init_data(init_data, BOT_TOKEN) == 555
+    assert len(tg_auth._verified) == 1
+    # second call is served from the cache
+    assert verify_init_data(init_data, BOT_TOKEN) == 555
+    assert len(tg_auth._verified) == 1
+
+
+def test_bad_signature_is_rejected_and_not_cached():
+    init_data = make_init_data(555, int(time.time()), token="999:OTHER")
+    with pytest.raises(InitDataError) as e:
+        verify_init_data(init_data, BOT_TOKEN)
+    assert e.value.reason == "invalid_signature"
+    assert len(tg_auth._verified) == 0
+
+
+def test_replay_outside_freshness_window_is_rejected():
+    now = time.time()
+    init_data = make_init_data(555, int(now))
+    assert verify_init_data(init_data, BOT_TOKEN, now=now) == 555
+    with pytest.raises(InitDataError) as e:
+        verify_init_data(init_data, BOT_TOKEN, now=now + tg_auth.TG_AUTH_MAX_AGE + 1)
+    assert e.value.reason == "init_data_expired"
+    assert len(tg_auth._verified) == 0
+
+
+def test_cache_is_bounded():
+    cache = tg_auth._VerifiedCache(2)
+    for i in range(5):
+        cache.put(bytes([i]), (i, 0))
+    assert len(cache) == 2
+    assert cache.get(bytes([0])) is None
+    assert cache.get(bytes([4])) == (4, 0)